@@ -14,6 +14,8 @@ Clients connect to GET /api/events/stream and receive typed events:
   - dashboard:refresh     — general dashboard data changed
   - commission:updated    — commission data changed
   - chat:message          — internal team chat message
+  - nonpay:progress       — non-pay upload progress (batched counts)
+  - nonpay:completed      — non-pay upload finished
 
 The event bus is in-memory (single-process). Each connected client gets
 an asyncio.Queue. When an event is published, it's pushed to all queues.
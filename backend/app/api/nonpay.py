@@ -4,30 +4,83 @@ Upload PDF or CSV of non-pay notices → Claude extracts policy numbers →
 Match to customers in DB → Send carrier-branded past-due emails.
 One email per policy per 7 days max.
 """
+import asyncio
+import binascii
 import csv
+import hashlib
 import io
-import json
-import base64
 import logging
+import posixpath
 import re
-from datetime import datetime, timedelta
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
+from xml.etree import ElementTree as ET
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Body
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-
-from app.core.database import get_db
+import lxml.html
+import orjson
+from lxml import etree
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, Body
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.database import get_db, SessionLocal
 from app.core.config import settings
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.customer import Customer, CustomerPolicy
 from app.models.nonpay import NonPayNotice, NonPayEmail
 from app.services.nonpay_email import send_nonpay_email
+from app.services.pdf_extract import b64encode_pdf
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/nonpay", tags=["nonpay"])
+# orjson for every endpoint; the large upload/history payloads return
+# ORJSONResponse directly to also skip jsonable_encoder
+router = APIRouter(prefix="/api/nonpay", tags=["nonpay"], default_response_class=ORJSONResponse)
+
+# pybase64 (SIMD) when installed; otherwise binascii directly, skipping the
+# base64 module's str→bytes re-encode of the whole payload
+try:
+    import pybase64
+except ImportError:
+    pybase64 = None
+
+
+def _b64decode(data: str) -> bytes:
+    """Decode an uploaded base64 payload."""
+    if pybase64 is not None:
+        return pybase64.b64decode(data, validate=False)
+    return binascii.a2b_base64(data)
+
+
+# Upload progress is published to the SSE bus in batches, not per policy
+PROGRESS_EVERY_POLICIES = 50
+PROGRESS_EVERY_SECONDS = 1.0
+
+
+def _publish_progress(event_type: str, data: dict):
+    """Push a nonpay:* event to connected SSE clients (best effort)."""
+    try:
+        from app.api.events import event_bus
+        event_bus.publish_sync(event_type, data)
+    except Exception as e:
+        logger.debug("Non-pay progress publish failed: %s", e)
+
+
+# CSVs above this size are parsed in a worker thread so they don't stall the event loop
+CSV_THREAD_THRESHOLD = 1 * 1024 * 1024
+
+
+async def _parse_csv(file_bytes: bytes) -> list[dict]:
+    """Run _extract_from_csv, off the event loop for large files."""
+    if len(file_bytes) > CSV_THREAD_THRESHOLD:
+        return await asyncio.to_thread(_extract_from_csv, file_bytes)
+    return _extract_from_csv(file_bytes)
 
 
 @router.get("/diag")
@@ -66,15 +119,15 @@ async def test_extract(payload: dict = Body(...)):
         if not data_b64:
             return {"error": "No data provided"}
 
-        file_bytes = base64.b64decode(data_b64)
-        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        file_bytes = _b64decode(data_b64)
+        ext = _file_ext(filename)
 
-        if ext in ("xlsx", "xls"):
-            policies = _extract_from_excel(file_bytes, ext)
+        if ext in _EXCEL_EXT:
+            policies = await asyncio.to_thread(_extract_from_excel, file_bytes, ext)
         elif ext == "pdf":
-            policies = await _extract_from_pdf(file_bytes)
+            policies = await _extract_from_pdf(file_bytes, pdf_b64=data_b64)
         else:
-            policies = _extract_from_csv(file_bytes)
+            policies = await _parse_csv(file_bytes)
 
         return {"filename": filename, "ext": ext, "policies_found": len(policies), "policies": policies[:5]}
     except Exception as e:
@@ -83,6 +136,79 @@ async def test_extract(payload: dict = Body(...)):
 
 # ── Extraction prompt for Claude ──────────────────────────────────────
 
+# Filename fragment → carrier key, checked in order (first hit wins)
+FILENAME_CARRIER_MAP = {
+    "trv": "travelers", "travelers": "travelers",
+    "prog": "progressive", "progressive": "progressive",
+    "safeco": "safeco", "geico": "geico", "grange": "grange",
+    "hippo": "hippo", "branch": "branch", "next": "next",
+    "gainsco": "gainsco", "steadily": "steadily", "obsidian": "steadily",
+    "integrity": "integrity", "clearcover": "clearcover",
+    "openly": "openly", "bristol": "bristol_west",
+    "natgen": "national_general", "national_general": "national_general",
+    "universal": "universal_property", "upcic": "universal_property",
+    "american_modern": "american_modern", "covertree": "covertree",
+}
+
+
+@lru_cache(maxsize=256)
+def _carrier_from_filename(filename: str) -> str:
+    """Infer a carrier key from an uploaded filename, or "" if none match."""
+    fn_lower = (filename or "").lower()
+    for pattern, carrier_key in FILENAME_CARRIER_MAP.items():
+        if pattern in fn_lower:
+            return carrier_key
+    return ""
+
+
+# Markdown code fence Claude sometimes wraps the JSON array in
+_JSON_FENCE_RE = re.compile(r"^\s*```(?:json)?|```\s*$")
+
+
+def _keyword_re(keywords: list[str]) -> re.Pattern:
+    """Compile a keyword list into one alternation so a text is scanned once."""
+    return re.compile("|".join(re.escape(kw) for kw in keywords))
+
+
+# Notice-type classification, checked in order (first category hit wins).
+# Spreadsheet "reason" column:
+_EXCEL_NOTICE_TYPE_RULES = (
+    (_keyword_re(["non payment", "non-payment", "nonpayment", "nsf",
+                  "non pay", "non-pay", "nonpay",
+                  "insufficient funds", "returned payment",
+                  "offer", "pending cancellation"]), "non-pay"),
+    (_keyword_re(["underwriting", "uw reason"]), "underwriting"),
+    (_keyword_re(["policyholder", "insured request", "customer request",
+                  "rewrite", "replacement", "policyholder's request"]), "voluntary"),
+)
+# GrangeWire alert "message" column:
+_GRANGE_NOTICE_TYPE_RULES = (
+    (_keyword_re(["non pay", "non-pay", "nsf", "offer", "pending cancellation"]), "non-pay"),
+    (_keyword_re(["underwriting"]), "underwriting"),
+    (_keyword_re(["policyholder", "rewrite"]), "voluntary"),
+)
+
+
+def _classify_notice_type(text_lower: str, rules: tuple) -> Optional[str]:
+    """Return the first matching notice type for lowercased text, or None."""
+    for pattern, notice_type in rules:
+        if pattern.search(text_lower):
+            return notice_type
+    return None
+
+
+# Cancel-reason keywords used to filter policies before sending
+_REASON_NONPAY_KEYWORDS = (
+    "non payment", "non-payment", "nonpayment", "non pay", "non-pay",
+    "nsf", "insufficient fund", "past due", "past-due",
+)
+_REASON_NONRENEWAL_KEYWORDS = ("non-renewal", "nonrenewal")
+_REASON_SKIP_KEYWORDS = (
+    "underwriting", "policyholder request", "insured request",
+    "company cancel",
+)
+
+
 # Policy number patterns for carrier auto-detection
 _POLICY_NUM_PATTERNS = [
     (re.compile(r'^\d{10,}\s*\d{0,2}$'), "national_general"),  # NatGen: "2027431477 00"
@@ -122,196 +248,90 @@ IMPORTANT:
 
 # ── Upload + Process ─────────────────────────────────────────────────
 
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# Upload allow-list; everything that isn't PDF or Excel is parsed as CSV/TSV
+_ALLOWED_EXT = frozenset({"pdf", "csv", "tsv", "txt", "xlsx", "xls"})
+_EXCEL_EXT = frozenset({"xlsx", "xls"})
+
+
+def _file_ext(filename: str) -> str:
+    """Lower-cased extension without the dot, or ""."""
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def _upload_ext(filename: str) -> str:
+    """Extension of an uploaded notice file; 400 if it isn't a supported format."""
+    ext = _file_ext(filename)
+    if ext not in _ALLOWED_EXT:
+        raise HTTPException(status_code=400, detail="Supported formats: PDF, CSV, XLS, XLSX")
+    return ext
+
+
+def _check_upload_size(size: int):
+    """400 if an upload exceeds MAX_UPLOAD_BYTES."""
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail="File too large (max 25MB)")
+
+
 @router.post("/upload-b64")
 async def upload_nonpay_b64(
+    background_tasks: BackgroundTasks,
     payload: dict = Body(...),
     dry_run: bool = Query(False),
+    background: bool = Query(False),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Fallback upload via base64 JSON body instead of multipart form."""
+    """Fallback upload via base64 JSON body instead of multipart form.
+    Set background=true to return the notice_id right away (see _start_notice)."""
     filename = payload.get("filename", "upload.csv")
     data_b64 = payload.get("data", "")
     carrier_override = payload.get("carrier_override", "")  # User-selected carrier fallback
     if not data_b64:
         raise HTTPException(status_code=400, detail="No file data provided")
 
-    file_bytes = base64.b64decode(data_b64)
-    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-    if ext not in ("pdf", "csv", "tsv", "txt", "xlsx", "xls"):
-        raise HTTPException(status_code=400, detail="Supported formats: PDF, CSV, XLS, XLSX")
-
-    if len(file_bytes) > 25 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large (max 25MB)")
-
-    try:
-        # Create notice record
-        notice = NonPayNotice(
-            filename=filename,
-            upload_type=ext,
-            uploaded_by=current_user.full_name or current_user.username,
-            status="processing",
-        )
-        db.add(notice)
-        db.commit()
-        db.refresh(notice)
-    except Exception as e:
-        db.rollback()
-        import traceback
-        raise HTTPException(status_code=500, detail=f"DB error creating notice: {str(e)}\n{traceback.format_exc()[-500:]}")
-
-    try:
-        if ext == "pdf":
-            policies = await _extract_from_pdf(file_bytes)
-        elif ext in ("xlsx", "xls"):
-            policies = _extract_from_excel(file_bytes, ext)
-        else:
-            policies = _extract_from_csv(file_bytes)
+    ext = _upload_ext(filename)  # before decoding, so bad types cost nothing
+    file_bytes = _b64decode(data_b64)
+    _check_upload_size(len(file_bytes))
 
-        notice.raw_extracted = policies
-        notice.policies_found = len(policies)
-
-        # Carrier inference from filename
-        FILENAME_CARRIER_MAP = {
-            "trv": "travelers", "travelers": "travelers",
-            "prog": "progressive", "progressive": "progressive",
-            "safeco": "safeco", "geico": "geico", "grange": "grange",
-            "hippo": "hippo", "branch": "branch", "next": "next",
-            "gainsco": "gainsco", "steadily": "steadily", "obsidian": "steadily",
-            "integrity": "integrity", "clearcover": "clearcover",
-            "openly": "openly", "bristol": "bristol_west",
-            "natgen": "national_general", "national_general": "national_general",
-            "universal": "universal_property", "upcic": "universal_property",
-            "american_modern": "american_modern", "covertree": "covertree",
-        }
-        has_any_carrier = any(p.get("carrier") for p in policies)
-        if not has_any_carrier and filename:
-            fn_lower = filename.lower()
-            for pattern, carrier_key in FILENAME_CARRIER_MAP.items():
-                if pattern in fn_lower:
-                    for p in policies:
-                        p["carrier"] = carrier_key
-                    has_any_carrier = True
-                    break
-
-        # Apply user-selected carrier override — ALWAYS overrides AI extraction
-        # User explicitly chose this carrier, so trust their selection
-        if carrier_override:
-            for p in policies:
-                p["carrier"] = carrier_override
-
-        # Detect carrier from policy number patterns
-        # NatGen: 10+ digit numbers, often with " 00" suffix (e.g. "2027431477 00")
-        for p in policies:
-            if not p.get("carrier"):
-                pn = (p.get("policy_number") or "").strip()
-                for pat, ckey in _POLICY_NUM_PATTERNS:
-                    if pat.match(pn):
-                        p["carrier"] = ckey
-                        break
-
-        results = []
-        matched = 0
-        sent = 0
-        letters = 0
-        skipped = 0
-
-        for pol in policies:
-            pnum = (pol.get("policy_number") or "").strip()
-            if not pnum:
-                continue
-
-            # Filter by cancellation reason — only process non-pay/NSF
-            notice_type = pol.get("notice_type", "non-pay")
-            cancel_reason = pol.get("cancel_reason", "")
-
-            # Also check reason text for non-payment keywords
-            reason_lower = cancel_reason.lower() if cancel_reason else ""
-            is_nonpay = any(kw in reason_lower for kw in [
-                "non payment", "non-payment", "nonpayment", "non pay", "non-pay",
-                "nsf", "insufficient fund", "past due", "past-due",
-            ])
-            is_skip = any(kw in reason_lower for kw in [
-                "underwriting", "policyholder request", "insured request",
-                "company cancel", "non-renewal", "nonrenewal",
-            ])
-
-            # Skip if explicitly not non-pay, or if reason text indicates skip
-            if is_skip or (notice_type not in ("non-pay", "past-due") and not is_nonpay):
-                # Skip non-actionable reasons
-                results.append({
-                    "policy_number": pnum,
-                    "insured_name": pol.get("insured_name", ""),
-                    "cancel_reason": cancel_reason,
-                    "notice_type": notice_type,
-                    "skipped_reason": True,
-                    "error": f"Skipped — {cancel_reason}" if cancel_reason else f"Skipped — {notice_type}",
-                })
-                continue
-
-            result = _process_single_policy(
-                db=db, notice_id=notice.id, policy_number=pnum,
-                carrier=pol.get("carrier", ""), insured_name=pol.get("insured_name", ""),
-                amount_due=pol.get("amount_due"), due_date=pol.get("due_date"),
-                cancel_date=pol.get("cancel_date"),
-                dry_run=dry_run,
-            )
-            result["cancel_reason"] = cancel_reason
-            result["notice_type"] = notice_type
-            results.append(result)
-            if result.get("matched"): matched += 1
-            if result.get("email_sent"): sent += 1
-            if result.get("letter_sent"): letters += 1
-            if result.get("skipped_rate_limit"): skipped += 1
-
-        notice.policies_matched = matched
-        notice.emails_sent = sent + letters
-        notice.emails_skipped = skipped
-        notice.status = "dry_run" if dry_run else "completed"
-        db.commit()
-
-        return {
-            "notice_id": notice.id, "filename": filename, "dry_run": dry_run,
-            "policies_found": len(policies), "policies_matched": matched,
-            "emails_sent": sent, "letters_sent": letters, "emails_skipped": skipped, "details": results,
-        }
-    except Exception as e:
-        import traceback
-        tb = traceback.format_exc()
-        try:
-            notice.status = "error"
-            notice.error_message = str(e)[:500]
-            db.commit()
-        except Exception:
-            db.rollback()
-        logger.error("Non-pay processing error: %s\n%s", e, tb)
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}\n{tb[-500:]}")
+    return await _start_notice(
+        background_tasks, background, file_bytes, filename, ext, dry_run, db, current_user,
+        carrier_override=carrier_override,
+        # The client's base64 can go to Claude as-is (see _extract_from_pdf)
+        pdf_b64=data_b64 if ext == "pdf" else "",
+    )
 
 
 @router.post("/upload")
 async def upload_nonpay_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     dry_run: bool = Query(False),
+    background: bool = Query(False),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Upload a non-pay PDF or CSV. Extracts policy info, matches customers, sends emails.
-    Set dry_run=true to preview matches without sending any emails."""
+    Set dry_run=true to preview matches without sending any emails.
+    Set background=true to return the notice_id right away (see _start_notice)."""
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
-    ext = file.filename.rsplit(".", 1)[-1].lower() if "." in file.filename else ""
-    if ext not in ("pdf", "csv", "tsv", "txt", "xlsx", "xls"):
-        raise HTTPException(status_code=400, detail="Supported formats: PDF, CSV, XLS, XLSX")
-
+    ext = _upload_ext(file.filename)
     file_bytes = await file.read()
-    if len(file_bytes) > 25 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large (max 25MB)")
+    _check_upload_size(len(file_bytes))
+
+    return await _start_notice(
+        background_tasks, background, file_bytes, file.filename, ext, dry_run, db, current_user,
+        detect_progressive=True, auto_check=True,
+    )
+
 
-    # Create notice record
+def _create_notice(db: Session, filename: str, ext: str, current_user: User) -> NonPayNotice:
+    """Insert the NonPayNotice row (status "processing") for an upload."""
     try:
         notice = NonPayNotice(
-            filename=file.filename,
+            filename=filename,
             upload_type=ext,
             uploaded_by=current_user.full_name or current_user.username,
             status="processing",
@@ -319,142 +339,292 @@ async def upload_nonpay_file(
         db.add(notice)
         db.commit()
         db.refresh(notice)
+        return notice
     except Exception as e:
         db.rollback()
         import traceback
         raise HTTPException(status_code=500, detail=f"DB error creating notice: {str(e)}\n{traceback.format_exc()[-500:]}")
 
+
+async def _start_notice(
+    background_tasks: BackgroundTasks,
+    background: bool,
+    file_bytes: bytes,
+    filename: str,
+    ext: str,
+    dry_run: bool,
+    db: Session,
+    current_user: User,
+    **options,
+) -> ORJSONResponse:
+    """Create the notice, then process it inline or after the response.
+
+    Inline (default) returns the full result. With ``background`` the response
+    is just {"notice_id", "status": "processing"}; the work runs as a
+    BackgroundTask on its own session and clients follow the nonpay:progress /
+    nonpay:completed events or poll /history.
+    """
+    notice = _create_notice(db, filename, ext, current_user)
+    if background:
+        background_tasks.add_task(
+            _process_notice_background, notice.id, file_bytes, filename, ext, dry_run, **options,
+        )
+        return ORJSONResponse({"notice_id": notice.id, "filename": filename, "status": "processing"})
+
+    # Returned as a Response so the large "details" list skips jsonable_encoder
+    return ORJSONResponse(await _process_notice(notice, file_bytes, filename, ext, dry_run, db, **options))
+
+
+async def _process_notice_background(notice_id: int, file_bytes: bytes, filename: str, ext: str,
+                                     dry_run: bool, **options):
+    """BackgroundTask entry point: run _process_notice with a fresh session."""
+    db = SessionLocal()
+    try:
+        notice = db.query(NonPayNotice).filter(NonPayNotice.id == notice_id).first()
+        if not notice:
+            logger.error("Non-pay notice %s not found for background processing", notice_id)
+            return
+        await _process_notice(notice, file_bytes, filename, ext, dry_run, db, **options)
+    except HTTPException:
+        # Already logged and recorded on the notice (status="error")
+        pass
+    except Exception as e:
+        logger.error("Background non-pay processing failed for notice %s: %s", notice_id, e)
+    finally:
+        db.close()
+
+
+async def _process_notice(
+    notice: NonPayNotice,
+    file_bytes: bytes,
+    filename: str,
+    ext: str,
+    dry_run: bool,
+    db: Session,
+    carrier_override: str = "",
+    detect_progressive: bool = False,
+    auto_check: bool = False,
+    pdf_b64: str = "",
+) -> dict:
+    """Shared upload pipeline: extract → match → send for a created notice.
+
+    carrier_override forces every policy to the user-selected carrier.
+    detect_progressive checks XLSX files for Progressive-specific formats first.
+    auto_check marks the daily checklist item for the carrier after a live send.
+    pdf_b64 is the upload's original base64 text, when it arrived that way.
+    """
     try:
         # Extract policies from file
         if ext == "pdf":
-            policies = await _extract_from_pdf(file_bytes)
-        elif ext in ("xlsx", "xls"):
+            policies = await _extract_from_pdf(file_bytes, pdf_b64=pdf_b64)
+        elif ext in _EXCEL_EXT:
             # Check for Progressive-specific file formats first
-            progressive_result = _detect_progressive_file(file_bytes, ext, file.filename)
+            progressive_result = None
+            if detect_progressive:
+                progressive_result = await asyncio.to_thread(_detect_progressive_file, file_bytes, ext, filename)
             if progressive_result:
                 policies = progressive_result["policies"]
                 # Process UW items separately — create tasks and optionally send emails
                 uw_items = progressive_result.get("uw_items", [])
                 if uw_items:
-                    _process_progressive_uw_items(db, uw_items, dry_run=dry_run, notice_id=notice.id)
+                    # Task inserts + Mailgun sends block — keep them off the event loop
+                    await asyncio.to_thread(
+                        _process_progressive_uw_items, db, uw_items, dry_run=dry_run, notice_id=notice.id,
+                    )
             else:
-                policies = _extract_from_excel(file_bytes, ext)
+                policies = await asyncio.to_thread(_extract_from_excel, file_bytes, ext)
         else:
-            policies = _extract_from_csv(file_bytes)
+            policies = await _parse_csv(file_bytes)
 
         notice.raw_extracted = policies
         notice.policies_found = len(policies)
 
-        # If no carrier was extracted, try to infer from filename
-        FILENAME_CARRIER_MAP = {
-            "trv": "travelers", "travelers": "travelers",
-            "prog": "progressive", "progressive": "progressive",
-            "safeco": "safeco", "geico": "geico", "grange": "grange",
-            "hippo": "hippo", "branch": "branch", "next": "next",
-            "gainsco": "gainsco", "steadily": "steadily", "obsidian": "steadily",
-            "integrity": "integrity", "clearcover": "clearcover",
-            "openly": "openly", "bristol": "bristol_west",
-            "natgen": "national_general", "national_general": "national_general",
-            "universal": "universal_property", "upcic": "universal_property",
-            "american_modern": "american_modern", "covertree": "covertree",
-        }
-        has_any_carrier = any(p.get("carrier") for p in policies)
-        if not has_any_carrier and file.filename:
-            fn_lower = file.filename.lower()
-            for pattern, carrier_key in FILENAME_CARRIER_MAP.items():
-                if pattern in fn_lower:
-                    for p in policies:
-                        p["carrier"] = carrier_key
-                    break
+        # Fill in carriers in one pass over the extracted rows:
+        # - a user-selected carrier override ALWAYS wins over AI extraction
+        #   (the user explicitly chose this carrier, so trust their selection)
+        # - otherwise, if no carrier was extracted at all, infer from filename
+        # - rows still without one fall back to policy number patterns
+        #   (e.g. NatGen: 10+ digit "2027431477 00")
+        fill_carrier = carrier_override
+        if not fill_carrier and not any(p.get("carrier") for p in policies):
+            fill_carrier = _carrier_from_filename(filename)
 
-        # Detect carrier from policy number patterns (e.g. NatGen: 10+ digit "2027431477 00")
         for p in policies:
-            if not p.get("carrier"):
+            if fill_carrier:
+                p["carrier"] = fill_carrier
+            elif not p.get("carrier"):
                 pn = (p.get("policy_number") or "").strip()
                 for pat, ckey in _POLICY_NUM_PATTERNS:
                     if pat.match(pn):
                         p["carrier"] = ckey
                         break
 
+        # Carrier exports often repeat a policy once per coverage line
+        policies = _merge_duplicate_policies(policies)
+
         # Process each policy
         results = []
         matched = 0
-        sent = 0
-        letters = 0
         skipped = 0
+        processed = 0
+        started = time.monotonic()
+        last_published = started
+
+        def publish_running():
+            _publish_progress("nonpay:progress", {
+                "notice_id": notice.id, "processed": processed, "total": len(policies),
+                "matched": matched, "sent": send_counts["sent"] + send_counts["letters"],
+                "skipped": skipped,
+            })
 
-        for pol in policies:
-            pnum = (pol.get("policy_number") or "").strip()
-            if not pnum:
-                continue
+        # Matching (DB, worker thread) and sending (network) overlap: every
+        # SEND_WINDOW deferred sends are queued to a sender task that claims
+        # and sends them on its own session while matching carries on.
+        send_queue: asyncio.Queue = asyncio.Queue()
+        send_counts = {"sent": 0, "letters": 0}
+        sender = asyncio.create_task(_send_worker(send_queue, send_counts, publish_running))
+        send_error = None
+        window = []
+
+        # Keep prefetched rows live across the per-policy commits; the request
+        # session gets its own setting back once the batch is done
+        expire_on_commit = db.expire_on_commit
+        db.expire_on_commit = False
+        try:
+            # Bulk-load exact policy matches, their customers and this week's
+            # contacts up front; _process_single_policy only queries for misses.
+            pnums = [(p.get("policy_number") or "").strip() for p in policies]
+            prefetched = await asyncio.to_thread(_prefetch_policies, db, pnums)
+            recent_contacts = await asyncio.to_thread(_prefetch_recent_contacts, db, pnums)
+
+            for idx, pol in enumerate(policies, 1):
+                if sender.done():
+                    # The sender only finishes early when it has failed
+                    break
 
-            # Filter by cancellation reason
-            notice_type = pol.get("notice_type", "non-pay")
-            cancel_reason = pol.get("cancel_reason", "")
-
-            reason_lower = cancel_reason.lower() if cancel_reason else ""
-            is_nonpay = any(kw in reason_lower for kw in [
-                "non payment", "non-payment", "nonpayment", "non pay", "non-pay",
-                "nsf", "insufficient fund", "past due", "past-due",
-            ])
-            is_skip = any(kw in reason_lower for kw in [
-                "underwriting", "policyholder request", "insured request",
-                "company cancel", "non-renewal", "nonrenewal",
-            ])
-
-            if is_skip or (notice_type not in ("non-pay", "past-due") and not is_nonpay):
-                results.append({
-                    "policy_number": pnum,
-                    "insured_name": pol.get("insured_name", ""),
-                    "cancel_reason": cancel_reason,
-                    "notice_type": notice_type,
-                    "skipped_reason": True,
-                    "error": f"Skipped — {cancel_reason}" if cancel_reason else f"Skipped — {notice_type}",
-                })
-                continue
+                processed = idx - 1
+                now = time.monotonic()
+                if idx % PROGRESS_EVERY_POLICIES == 0 or now - last_published >= PROGRESS_EVERY_SECONDS:
+                    last_published = now
+                    publish_running()
 
-            result = _process_single_policy(
-                db=db,
-                notice_id=notice.id,
-                policy_number=pnum,
-                carrier=pol.get("carrier", ""),
-                insured_name=pol.get("insured_name", ""),
-                amount_due=pol.get("amount_due"),
-                due_date=pol.get("due_date"),
-                cancel_date=pol.get("cancel_date"),
-                dry_run=dry_run,
-            )
-            result["cancel_reason"] = cancel_reason
-            result["notice_type"] = notice_type
-            results.append(result)
-            if result.get("matched"):
-                matched += 1
-            if result.get("email_sent"):
-                sent += 1
-            if result.get("skipped_rate_limit"):
-                skipped += 1
+                pnum = (pol.get("policy_number") or "").strip()
+                if not pnum:
+                    continue
+
+                # Filter by cancellation reason — only process non-pay/NSF
+                notice_type = pol.get("notice_type", "non-pay")
+                cancel_reason = pol.get("cancel_reason", "")
+
+                # Also check reason text for non-payment keywords
+                reason_lower = cancel_reason.lower() if cancel_reason else ""
+                is_nonpay = _contains_any(_REASON_NONPAY_KEYWORDS, reason_lower)
+                is_skip = (
+                    _contains_any(_REASON_SKIP_KEYWORDS, reason_lower)
+                    or _contains_any(_REASON_NONRENEWAL_KEYWORDS, reason_lower)
+                )
+
+                # Skip if explicitly not non-pay, or if reason text indicates skip
+                if is_skip or (notice_type not in ("non-pay", "past-due") and not is_nonpay):
+                    results.append({
+                        "policy_number": pnum,
+                        "insured_name": pol.get("insured_name", ""),
+                        "cancel_reason": cancel_reason,
+                        "notice_type": notice_type,
+                        "skipped_reason": True,
+                        "error": f"Skipped — {cancel_reason}" if cancel_reason else f"Skipped — {notice_type}",
+                    })
+                    continue
+
+                # Blocking DB lookups + Mailgun/Thanks.io sends run in a worker thread
+                # so the event loop keeps serving (and streaming progress) meanwhile.
+                # Calls are sequential, so sharing the Session across threads is safe.
+                result = await asyncio.to_thread(
+                    _process_single_policy,
+                    db=db,
+                    notice_id=notice.id,
+                    policy_number=pnum,
+                    carrier=pol.get("carrier", ""),
+                    insured_name=pol.get("insured_name", ""),
+                    amount_due=pol.get("amount_due"),
+                    due_date=pol.get("due_date"),
+                    cancel_date=pol.get("cancel_date"),
+                    dry_run=dry_run,
+                    prefetched=prefetched,
+                    recent_contacts=recent_contacts,
+                    defer_send=True,
+                )
+                result["cancel_reason"] = cancel_reason
+                result["notice_type"] = notice_type
+                results.append(result)
+                if result.get("matched"):
+                    matched += 1
+                if result.get("skipped_rate_limit"):
+                    skipped += 1
+                if result.get("pending_send"):
+                    window.append(result)
+                    if len(window) >= SEND_WINDOW:
+                        send_queue.put_nowait(window)
+                        window = []
+            else:
+                send_queue.put_nowait(window)
+        finally:
+            db.expire_on_commit = expire_on_commit
+            # On error only already-queued (and claimed) windows are sent
+            send_queue.put_nowait(None)
+            try:
+                await sender
+            except Exception as e:
+                send_error = e
+                logger.error("Non-pay sender failed for notice %s: %s", notice.id, e)
+
+        if send_error is not None:
+            # Keep the per-policy results; flag what never reached the sender
+            for r in results:
+                if r.pop("pending_send", None) is not None:
+                    r["error"] = "Not sent — sending stopped"
+
+        sent = sum(1 for r in results if r.get("email_sent"))
+        letters = sum(1 for r in results if r.get("letter_sent"))
+        skipped = sum(1 for r in results if r.get("skipped_rate_limit"))
 
         notice.policies_matched = matched
-        notice.emails_sent = sent
+        notice.emails_sent = sent + letters
         notice.emails_skipped = skipped
-        notice.status = "dry_run" if dry_run else "completed"
+        if send_error is not None:
+            notice.status = "error"
+            notice.error_message = f"Sending stopped: {send_error}"[:500]
+        else:
+            notice.status = "dry_run" if dry_run else "completed"
         db.commit()
 
+        logger.info(
+            "Non-pay notice %s processed in %.1fs: %s policies, %s matched, %s emails, %s letters, %s skipped (dry_run=%s)",
+            notice.id, time.monotonic() - started, len(policies), matched, sent, letters, skipped, dry_run,
+        )
+        _publish_progress("nonpay:completed", {
+            "notice_id": notice.id, "processed": len(policies), "total": len(policies),
+            "matched": matched, "sent": sent + letters, "skipped": skipped, "status": notice.status,
+        })
+
         # Auto-mark the daily checklist item for this carrier when sent (not dry_run)
-        if not dry_run:
+        if auto_check and not dry_run:
             try:
-                _auto_check_nonpay_carrier(db, policies, file.filename if file else "")
+                await asyncio.to_thread(_auto_check_nonpay_carrier, db, policies, filename)
             except Exception as e:
                 logger.warning(f"Failed to auto-check carrier on daily checklist: {e}")
 
         return {
             "notice_id": notice.id,
-            "filename": file.filename,
+            "filename": filename,
             "dry_run": dry_run,
-            "policies_found": len(policies),
+            "policies_found": notice.policies_found,
+            "policies_unique": len(policies),
             "policies_matched": matched,
             "emails_sent": sent,
+            "letters_sent": letters,
             "emails_skipped": skipped,
+            "error": notice.error_message if send_error is not None else None,
             "details": results,
         }
 
@@ -469,73 +639,80 @@ async def upload_nonpay_file(
             db.rollback()
         logger.error("Non-pay processing error: %s\n%s", e, tb)
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}\n{tb[-500:]}")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 
+# Carrier names/keys → daily checklist keys (exact match first, then partial)
+_CHECKLIST_CARRIER_KEYS = {
+    "national_general": "nonpay_natgen",
+    "national general": "nonpay_natgen",
+    "national general insurance": "nonpay_natgen",
+    "natgen": "nonpay_natgen",
+    "progressive": "nonpay_progressive",
+    "progressive insurance": "nonpay_progressive",
+    "progressive northern": "nonpay_progressive",
+    "safeco": "nonpay_safeco",
+    "safeco insurance": "nonpay_safeco",
+    "travelers": "nonpay_travelers",
+    "travelers personal": "nonpay_travelers",
+    "grange": "nonpay_grange",
+    "grange insurance": "nonpay_grange",
+    "geico": "nonpay_geico",
+    "steadily": "nonpay_steadily",
+    "openly": "nonpay_openly",
+}
+
+# Filename fragment → daily checklist key, checked in order (first hit wins)
+_CHECKLIST_FILENAME_PATTERNS = {
+    "natgen": "nonpay_natgen", "national_general": "nonpay_natgen", "national general": "nonpay_natgen",
+    "pending_cancellation": "nonpay_natgen", "pending cancellation": "nonpay_natgen",
+    "progressive": "nonpay_progressive",
+    "safeco": "nonpay_safeco",
+    "trv": "nonpay_travelers", "travelers": "nonpay_travelers",
+    "grange": "nonpay_grange",
+    "geico": "nonpay_geico",
+    "steadily": "nonpay_steadily",
+}
+
+
+@lru_cache(maxsize=256)
+def _checklist_key_for_carrier(carrier_lower: str) -> Optional[str]:
+    """Map a lower-cased extracted carrier name to its checklist key."""
+    if carrier_lower in _CHECKLIST_CARRIER_KEYS:
+        return _CHECKLIST_CARRIER_KEYS[carrier_lower]
+    for pattern, key in _CHECKLIST_CARRIER_KEYS.items():
+        if pattern in carrier_lower or carrier_lower in pattern:
+            return key
+    return None
+
+
+@lru_cache(maxsize=256)
+def _checklist_key_for_filename(filename: str) -> Optional[str]:
+    """Map an uploaded filename to its checklist key, or None."""
+    fn_lower = (filename or "").lower()
+    for pattern, key in _CHECKLIST_FILENAME_PATTERNS.items():
+        if pattern in fn_lower:
+            return key
+    return None
 
 
 def _auto_check_nonpay_carrier(db: Session, policies: list, filename: str):
     """Auto-mark the daily checklist when a non-pay list is uploaded and sent."""
     from datetime import date as date_type
 
-    # Map carrier names/keys to checklist keys
-    CARRIER_TO_KEY = {
-        "national_general": "nonpay_natgen",
-        "national general": "nonpay_natgen",
-        "national general insurance": "nonpay_natgen",
-        "natgen": "nonpay_natgen",
-        "progressive": "nonpay_progressive",
-        "progressive insurance": "nonpay_progressive",
-        "progressive northern": "nonpay_progressive",
-        "safeco": "nonpay_safeco",
-        "safeco insurance": "nonpay_safeco",
-        "travelers": "nonpay_travelers",
-        "travelers personal": "nonpay_travelers",
-        "grange": "nonpay_grange",
-        "grange insurance": "nonpay_grange",
-        "geico": "nonpay_geico",
-        "steadily": "nonpay_steadily",
-        "openly": "nonpay_openly",
-    }
-
-    # Also detect from filename patterns
-    FILENAME_PATTERNS = {
-        "natgen": "nonpay_natgen", "national_general": "nonpay_natgen", "national general": "nonpay_natgen",
-        "pending_cancellation": "nonpay_natgen", "pending cancellation": "nonpay_natgen",
-        "progressive": "nonpay_progressive",
-        "safeco": "nonpay_safeco",
-        "trv": "nonpay_travelers", "travelers": "nonpay_travelers",
-        "grange": "nonpay_grange",
-        "geico": "nonpay_geico",
-        "steadily": "nonpay_steadily",
-    }
-
     carrier_key = None
-    fn_lower = (filename or "").lower()
 
     # Try from extracted carrier in policies FIRST (most reliable)
     if policies:
         for pol in policies:
             c = (pol.get("carrier") or "").lower().strip()
             if c:
-                # Try exact match
-                if c in CARRIER_TO_KEY:
-                    carrier_key = CARRIER_TO_KEY[c]
-                    break
-                # Try partial match
-                for pattern, key in CARRIER_TO_KEY.items():
-                    if pattern in c or c in pattern:
-                        carrier_key = key
-                        break
+                carrier_key = _checklist_key_for_carrier(c)
                 if carrier_key:
                     break
 
     # Fallback to filename
     if not carrier_key:
-        for pattern, key in FILENAME_PATTERNS.items():
-            if pattern in fn_lower:
-                carrier_key = key
-                break
+        carrier_key = _checklist_key_for_filename(filename)
 
     if not carrier_key:
         logger.info(f"Could not determine carrier for auto-checklist. filename={filename}, sample_carrier={policies[0].get('carrier') if policies else 'none'}")
@@ -568,6 +745,327 @@ def _auto_check_nonpay_carrier(db: Session, policies: list, filename: str):
     else:
         logger.info(f"Checklist item {carrier_key} already checked for today")
 
+
+def _insert_nonpay_email(db: Session, **values) -> Optional[int]:
+    """Insert a NonPayEmail row and return its id.
+
+    Returns None when ux_nonpay_emails_policy_week already holds a live
+    contact for this policy this week (e.g. a concurrent upload won the race).
+    """
+    stmt = (
+        pg_insert(NonPayEmail)
+        .values(**values)
+        .on_conflict_do_nothing()
+        .returning(NonPayEmail.id)
+    )
+    return db.execute(stmt).scalar()
+
+
+@lru_cache(maxsize=4096)
+def _policy_number_variants(policy_number: str) -> tuple[str, str]:
+    """Return (compact, base) forms of a policy number for fuzzy DB lookups.
+
+    compact strips spaces/dashes/tabs (NatGen: "2032293985 00" → "203229398500");
+    base drops any suffix (618207668-653-1 → 618207668).
+    """
+    compact = policy_number.replace(" ", "").replace("-", "").replace("\t", "").strip()
+    head = policy_number.split("-")[0].split()
+    base = head[0].strip() if head else ""
+    return compact, base
+
+
+PREFETCH_BATCH_SIZE = 1000
+
+
+def _policy_query(db: Session):
+    """CustomerPolicy query that joins in the policy's customer (one round trip)."""
+    return db.query(CustomerPolicy).options(joinedload(CustomerPolicy.customer))
+
+
+_NOTICE_DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
+
+
+def _parse_notice_date(value) -> Optional[datetime]:
+    """Parse a due/cancel date as the extractors emit it; None if unrecognized."""
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    for fmt in _NOTICE_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _merge_duplicate_policies(policies: list[dict]) -> list[dict]:
+    """Collapse rows for the same policy (compacted, upper-cased number) into one.
+
+    Only rows with the same notice_type and cancel_reason merge, so a non-pay
+    line is never hidden behind another reason. The first row is kept, with
+    the largest amount_due, the earliest due_date/cancel_date (so the customer
+    is never told a later deadline than the carrier's) and any blank fields
+    filled from its duplicates.
+    """
+    merged = {}
+    out = []
+    for p in policies:
+        pnum = (p.get("policy_number") or "").strip()
+        if not pnum:
+            out.append(p)
+            continue
+        key = (_policy_number_variants(pnum)[0].upper(), p.get("notice_type"), p.get("cancel_reason"))
+        first = merged.get(key)
+        if first is None:
+            merged[key] = p
+            out.append(p)
+            continue
+        amt, first_amt = p.get("amount_due"), first.get("amount_due")
+        if isinstance(amt, (int, float)) and not (isinstance(first_amt, (int, float)) and first_amt >= amt):
+            first["amount_due"] = amt
+        for field in ("due_date", "cancel_date"):
+            when, first_when = _parse_notice_date(p.get(field)), _parse_notice_date(first.get(field))
+            if when and first_when and when < first_when:
+                first[field] = p[field]
+        for field, value in p.items():
+            if value and not first.get(field):
+                first[field] = value
+    return out
+
+
+def _prefetch_policies(db: Session, policy_numbers) -> dict:
+    """Load CustomerPolicy rows for exact (and compacted) policy numbers in bulk.
+
+    Returns {policy_number: CustomerPolicy}; the first row wins for duplicate
+    numbers. Fuzzy policy_number_norm fallbacks stay in _process_single_policy.
+    """
+    wanted = set()
+    for pnum in policy_numbers:
+        if pnum:
+            wanted.add(pnum)
+            wanted.add(_policy_number_variants(pnum)[0])
+    wanted = list(wanted)
+
+    found = {}
+    for i in range(0, len(wanted), PREFETCH_BATCH_SIZE):
+        # Customers ride along in one extra IN query per batch
+        rows = db.query(CustomerPolicy).options(selectinload(CustomerPolicy.customer)).filter(
+            CustomerPolicy.policy_number.in_(wanted[i:i + PREFETCH_BATCH_SIZE])
+        ).all()
+        for row in rows:
+            found.setdefault(row.policy_number, row)
+    return found
+
+
+def _prefetch_recent_contacts(db: Session, policy_numbers) -> dict:
+    """Latest sent email/letter per policy in the past week, for the 1x/week rate limit.
+
+    Returns {(policy_number, email_status): latest sent_at}. Pass the same dict
+    to _process_single_policy for the whole batch; it records new sends in it.
+    """
+    one_week_ago = datetime.utcnow() - timedelta(days=7)
+    wanted = list({p for p in policy_numbers if p})
+    found = {}
+    for i in range(0, len(wanted), PREFETCH_BATCH_SIZE):
+        rows = db.query(
+            NonPayEmail.policy_number, NonPayEmail.email_status, func.max(NonPayEmail.sent_at)
+        ).filter(
+            NonPayEmail.policy_number.in_(wanted[i:i + PREFETCH_BATCH_SIZE]),
+            NonPayEmail.email_status.in_(["sent", "letter_sent"]),
+            NonPayEmail.sent_at >= one_week_ago,
+        ).group_by(NonPayEmail.policy_number, NonPayEmail.email_status).all()
+        for pnum, status, sent_at in rows:
+            found[(pnum, status)] = sent_at
+    return found
+
+
+def _recent_contact_at(db: Session, policy_number: str, statuses: tuple, recent_contacts: Optional[dict]):
+    """Return when this policy was last contacted (with one of statuses) in the past week, or None."""
+    if recent_contacts is not None:
+        sent = [recent_contacts[(policy_number, st)] for st in statuses if (policy_number, st) in recent_contacts]
+        return max(sent) if sent else None
+    one_week_ago = datetime.utcnow() - timedelta(days=7)
+    recent = db.query(NonPayEmail).filter(
+        NonPayEmail.policy_number == policy_number,
+        NonPayEmail.email_status.in_(statuses),
+        NonPayEmail.sent_at >= one_week_ago,
+    ).first()
+    # sent_at is never NULL here — the >= filter excludes NULLs
+    return recent.sent_at if recent else None
+
+
+def _defer_send(result: dict, recent_contacts: Optional[dict], kind: str, record: dict, send_kwargs: dict) -> dict:
+    """Park a live email/letter send on the result for _dispatch_pending_sends."""
+    result["pending_send"] = {"kind": kind, "record": record, "send": send_kwargs}
+    if recent_contacts is not None:
+        # Counts as contacted for the rest of the batch, as an immediate send would
+        status = "letter_sent" if kind == "letter" else "sent"
+        recent_contacts[(record["policy_number"], status)] = datetime.now(timezone.utc)
+    return result
+
+
+def _claim_and_send(db: Session, result: dict, recent_contacts: Optional[dict], kind: str, record: dict, send_kwargs: dict) -> dict:
+    """Record, then send, one email/letter right away (the non-deferred path).
+
+    The row is inserted with an optimistic sent/letter_sent status and
+    committed BEFORE sending, so a retry/timeout never resends. A None id
+    means ux_nonpay_emails_policy_week already holds this week's contact
+    (e.g. a concurrent upload won the race) and nothing is sent. The actual
+    outcome is written back and committed right away: callers (e.g. the
+    cancellation poller) may swallow a later error without a rollback, and a
+    lost failed status would suppress this week's retry.
+    """
+    sent_status = "letter_sent" if kind == "letter" else "sent"
+    record_id = _insert_nonpay_email(db, **record, email_status=sent_status, error_message=None)
+    db.commit()
+    if record_id is None:
+        result["skipped_rate_limit"] = True
+        result["error"] = "Already contacted this week"
+        return result
+
+    if kind == "letter":
+        from app.services.thanksio_letter import send_thanksio_letter
+        send_result = send_thanksio_letter(**send_kwargs)
+        result["letter_sent"] = send_result.get("success", False)
+        result["letter_order_id"] = send_result.get("order_id")
+        outcome = {"mailgun_message_id": send_result.get("order_id")}
+        failed_status = "letter_failed"
+    else:
+        send_result = send_nonpay_email(**send_kwargs)
+        result["email_sent"] = send_result.get("success", False)
+        outcome = {"mailgun_message_id": send_result.get("message_id")}
+        failed_status = "failed"
+
+    if not send_result.get("success"):
+        result["error"] = send_result.get("error")
+        outcome["email_status"] = failed_status
+        outcome["error_message"] = send_result.get("error")
+    db.execute(update(NonPayEmail).where(NonPayEmail.id == record_id).values(**outcome))
+    db.commit()
+    if recent_contacts is not None and send_result.get("success"):
+        recent_contacts[(record["policy_number"], sent_status)] = datetime.now(timezone.utc)
+    return result
+
+
+SEND_CONCURRENCY = 20
+# Deferred sends handed from the matching loop to _send_worker per batch
+SEND_WINDOW = 64
+
+
+def _claim_pending_sends(db: Session, pending: list[dict]) -> dict:
+    """Insert the NonPayEmail rows for deferred sends and commit. Returns {policy_number: id}.
+
+    Rows get an optimistic sent/letter_sent status and are committed BEFORE
+    anything is sent, so a retry can never resend. Policies another upload
+    already claimed this week (ux_nonpay_emails_policy_week) get no row.
+    """
+    rows = []
+    for r in pending:
+        p = r["pending_send"]
+        rows.append({
+            **p["record"],
+            "email_status": "letter_sent" if p["kind"] == "letter" else "sent",
+            "error_message": None,
+        })
+    # executemany form: one cached statement, paged into multi-row INSERTs by
+    # SQLAlchemy's insertmanyvalues (no per-row ORM objects, no per-batch compile)
+    claimed = dict(db.execute(
+        pg_insert(NonPayEmail)
+        .on_conflict_do_nothing()
+        .returning(NonPayEmail.policy_number, NonPayEmail.id),
+        rows,
+    ).all())
+    db.commit()
+    return claimed
+
+
+async def _dispatch_pending_sends(db: Session, results: list[dict]):
+    """Record, then send, every email/letter deferred by _process_single_policy.
+
+    Rows are claimed in bulk first (_claim_pending_sends). Sends then run
+    concurrently — emails over one shared httpx client, letters in worker
+    threads — at most SEND_CONCURRENCY at a time. Failures are written back
+    in one bulk UPDATE, committed by the caller.
+    """
+    pending = [r for r in results if r.get("pending_send")]
+    if not pending:
+        return
+
+    claimed = await asyncio.to_thread(_claim_pending_sends, db, pending)
+
+    to_send = []
+    for r in pending:
+        p = r.pop("pending_send")
+        # pop: a policy listed twice gets one claimed row, and only one send
+        record_id = claimed.pop(p["record"]["policy_number"], None)
+        if record_id is None:
+            r["skipped_rate_limit"] = True
+            r["error"] = "Already contacted this week"
+            continue
+        to_send.append((r, p, record_id))
+
+    from app.services.nonpay_email import send_nonpay_email_async
+    from app.services.thanksio_letter import send_thanksio_letter
+
+    sem = asyncio.Semaphore(SEND_CONCURRENCY)
+
+    async def _send(p):
+        async with sem:
+            if p["kind"] == "letter":
+                return await asyncio.to_thread(send_thanksio_letter, **p["send"])
+            return await send_nonpay_email_async(client, **p["send"])
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        send_results = await asyncio.gather(*(_send(p) for _, p, _ in to_send), return_exceptions=True)
+
+    outcomes = []
+    for (r, p, record_id), send_result in zip(to_send, send_results):
+        if isinstance(send_result, Exception):
+            logger.error("Non-pay %s send failed for %s: %s", p["kind"], p["record"]["policy_number"], send_result)
+            send_result = {"success": False, "error": str(send_result)}
+
+        if p["kind"] == "letter":
+            r["letter_sent"] = send_result.get("success", False)
+            r["letter_order_id"] = send_result.get("order_id")
+            outcome = {"id": record_id, "mailgun_message_id": send_result.get("order_id")}
+            failed_status = "letter_failed"
+        else:
+            r["email_sent"] = send_result.get("success", False)
+            outcome = {"id": record_id, "mailgun_message_id": send_result.get("message_id")}
+            failed_status = "failed"
+
+        if not send_result.get("success"):
+            r["error"] = send_result.get("error")
+            outcome["email_status"] = failed_status
+            outcome["error_message"] = send_result.get("error")
+        outcomes.append(outcome)
+
+    if outcomes:
+        # ORM bulk UPDATE by primary key — one executemany per distinct key set
+        await asyncio.to_thread(db.execute, update(NonPayEmail), outcomes)
+
+
+async def _send_worker(queue: asyncio.Queue, counts: dict, on_progress=None):
+    """Consume windows of deferred-send results until None; dispatch each in order.
+
+    Runs on its own session so claims/outcome updates can overlap the
+    matching loop's queries on the request session. Emails/letters sent so
+    far are added to counts after every window and on_progress is called.
+    """
+    send_db = SessionLocal()
+    try:
+        while (window := await queue.get()) is not None:
+            if window:
+                await _dispatch_pending_sends(send_db, window)
+                await asyncio.to_thread(send_db.commit)
+                counts["sent"] += sum(1 for r in window if r.get("email_sent"))
+                counts["letters"] += sum(1 for r in window if r.get("letter_sent"))
+                if on_progress:
+                    on_progress()
+    finally:
+        send_db.close()
+
+
 def _process_single_policy(
     db: Session,
     notice_id: int,
@@ -578,8 +1076,20 @@ def _process_single_policy(
     due_date: Optional[str],
     cancel_date: Optional[str] = None,
     dry_run: bool = False,
+    prefetched: Optional[dict] = None,
+    recent_contacts: Optional[dict] = None,
+    defer_send: bool = False,
 ) -> dict:
-    """Match a policy to a customer and send email if within rate limit."""
+    """Match a policy to a customer and send email if within rate limit.
+
+    ``prefetched`` and ``recent_contacts`` are optional maps from
+    _prefetch_policies / _prefetch_recent_contacts; when given they replace
+    the per-policy exact-match, customer and rate-limit queries. Policies are
+    loaded with their customer either way (see CustomerPolicy.customer).
+
+    With ``defer_send`` a live send is not performed: the result carries a
+    ``pending_send`` entry for _dispatch_pending_sends to record and send in bulk.
+    """
     result = {
         "policy_number": policy_number,
         "carrier": carrier,
@@ -591,48 +1101,55 @@ def _process_single_policy(
         "error": None,
     }
 
+    compact, base_number = _policy_number_variants(policy_number)
+
     # Find policy in our DB
-    policy = db.query(CustomerPolicy).filter(
-        CustomerPolicy.policy_number == policy_number
-    ).first()
+    if prefetched is not None:
+        # Exact and compacted numbers were loaded in bulk up front
+        policy = prefetched.get(policy_number) or prefetched.get(compact)
+    else:
+        policy = _policy_query(db).filter(
+            CustomerPolicy.policy_number == policy_number
+        ).first()
 
-    if not policy:
-        # Try with spaces/dashes removed (NatGen: "2032293985 00" vs DB "203229398500")
-        compact = policy_number.replace(" ", "").replace("-", "").replace("	", "").strip()
-        if compact != policy_number:
-            policy = db.query(CustomerPolicy).filter(
-                CustomerPolicy.policy_number == compact
-            ).first()
+        if not policy:
+            # Try with spaces/dashes removed (NatGen: "2032293985 00" vs DB "203229398500")
+            if compact != policy_number:
+                policy = _policy_query(db).filter(
+                    CustomerPolicy.policy_number == compact
+                ).first()
 
-    if not policy:
-        # Try partial match (some reports truncate policy numbers)
-        policy = db.query(CustomerPolicy).filter(
-            CustomerPolicy.policy_number.ilike(f"%{policy_number}%")
+    # Fuzzy fallbacks run against policy_number_norm (upper-cased, no spaces/
+    # dashes/tabs, B-tree indexed with text_pattern_ops): equality and prefix
+    # are index lookups, only the "contains" scans still touch every row.
+    norm = compact.upper()
+
+    if not policy and norm:
+        # Same number, different formatting/case ("abc-123" vs "ABC 123")
+        policy = _policy_query(db).filter(
+            CustomerPolicy.policy_number_norm == norm
         ).first()
 
-    if not policy:
-        # Try partial match with compact version
-        compact = policy_number.replace(" ", "").replace("-", "").replace("	", "").strip()
-        if compact != policy_number:
-            policy = db.query(CustomerPolicy).filter(
-                CustomerPolicy.policy_number.ilike(f"%{compact}%")
-            ).first()
+    if not policy and norm:
+        # DB has longer number that starts with our extracted number
+        policy = _policy_query(db).filter(
+            CustomerPolicy.policy_number_norm.like(f"{norm}%")
+        ).first()
+
+    if not policy and norm:
+        # Try partial match (some reports truncate policy numbers)
+        policy = _policy_query(db).filter(
+            CustomerPolicy.policy_number_norm.contains(norm)
+        ).first()
 
     if not policy:
         # Try base number (strip suffix like 618207668-653-1 → 618207668)
-        base_number = policy_number.split("-")[0].split()[0].strip()
         if base_number and base_number != policy_number:
-            policy = db.query(CustomerPolicy).filter(
-                CustomerPolicy.policy_number.ilike(f"%{base_number}%")
+            base_norm = _policy_number_variants(base_number)[0].upper()
+            policy = _policy_query(db).filter(
+                CustomerPolicy.policy_number_norm.contains(base_norm)
             ).first()
 
-    if not policy:
-        # Try reverse: maybe DB has longer number that contains our extracted number
-        compact = policy_number.replace(" ", "").replace("-", "").replace("	", "")
-        policy = db.query(CustomerPolicy).filter(
-            CustomerPolicy.policy_number.ilike(f"{compact}%")
-        ).first()
-
     if not policy:
         # Try matching by customer name if we have insured_name
         if insured_name:
@@ -653,23 +1170,17 @@ def _process_single_policy(
                         # Try Thanks.io letter for name-matched customers without email
                         if customer.address and customer.city and customer.state and customer.zip_code:
                             # Check rate limit before sending letter
-                            one_week_ago = datetime.utcnow() - timedelta(days=7)
-                            recent_contact = db.query(NonPayEmail).filter(
-                                NonPayEmail.policy_number == policy_number,
-                                NonPayEmail.email_status.in_(["sent", "letter_sent"]),
-                                NonPayEmail.sent_at >= one_week_ago,
-                            ).first()
-                            if recent_contact:
+                            last_sent = _recent_contact_at(db, policy_number, ("sent", "letter_sent"), recent_contacts)
+                            if last_sent:
                                 result["skipped_rate_limit"] = True
-                                result["last_sent"] = recent_contact.sent_at.isoformat() if recent_contact.sent_at else None
+                                result["last_sent"] = last_sent.isoformat()
                                 return result
                             if dry_run:
                                 result["would_send_letter"] = True
                                 result["letter_address"] = f"{customer.address}, {customer.city}, {customer.state} {customer.zip_code}"
                                 result["dry_run"] = True
                                 return result
-                            from app.services.thanksio_letter import send_thanksio_letter
-                            letter_result = send_thanksio_letter(
+                            letter_kwargs = dict(
                                 client_name=customer.full_name,
                                 address=customer.address,
                                 city=customer.city,
@@ -680,33 +1191,24 @@ def _process_single_policy(
                                 amount_due=float(amount_due) if amount_due else None,
                                 due_date=due_date,
                             )
-                            letter_record = NonPayEmail(
+                            record = dict(
                                 notice_id=notice_id, policy_number=policy_number,
                                 customer_id=customer.id, customer_name=customer.full_name,
                                 customer_email=None, carrier=carrier,
                                 amount_due=amount_due, due_date=due_date,
-                                email_status="letter_sent" if letter_result.get("success") else "letter_failed",
-                                mailgun_message_id=letter_result.get("order_id"),
-                                error_message=letter_result.get("error"),
                             )
-                            db.add(letter_record)
-                            db.commit()
-                            result["letter_sent"] = letter_result.get("success", False)
-                            return result
+                            if defer_send:
+                                return _defer_send(result, recent_contacts, "letter", record, letter_kwargs)
+                            return _claim_and_send(db, result, recent_contacts, "letter", record, letter_kwargs)
                         else:
                             result["error"] = "No email and incomplete mailing address"
                             return result
                     # Skip rate limit check and sending for name matches in case of ambiguity
                     # Actually, DO check rate limit to avoid duplicate sends
-                    one_week_ago = datetime.utcnow() - timedelta(days=7)
-                    recent_email = db.query(NonPayEmail).filter(
-                        NonPayEmail.policy_number == policy_number,
-                        NonPayEmail.email_status.in_(["sent", "letter_sent"]),
-                        NonPayEmail.sent_at >= one_week_ago,
-                    ).first()
-                    if recent_email:
+                    last_sent = _recent_contact_at(db, policy_number, ("sent", "letter_sent"), recent_contacts)
+                    if last_sent:
                         result["skipped_rate_limit"] = True
-                        result["last_sent"] = recent_email.sent_at.isoformat() if recent_email.sent_at else None
+                        result["last_sent"] = last_sent.isoformat()
                         return result
                     if dry_run:
                         result["would_send"] = True
@@ -714,7 +1216,7 @@ def _process_single_policy(
                         return result
                     # For live mode, proceed to send
                     effective_carrier = carrier or ""
-                    email_result = send_nonpay_email(
+                    email_kwargs = dict(
                         to_email=customer.email,
                         client_name=customer.full_name,
                         policy_number=policy_number,
@@ -723,7 +1225,7 @@ def _process_single_policy(
                         due_date=due_date,
                         cancel_date=cancel_date,
                     )
-                    email_record = NonPayEmail(
+                    record = dict(
                         notice_id=notice_id,
                         policy_number=policy_number,
                         customer_id=customer.id,
@@ -732,14 +1234,10 @@ def _process_single_policy(
                         carrier=effective_carrier,
                         amount_due=amount_due,
                         due_date=due_date,
-                        email_status="sent" if email_result.get("success") else "failed",
-                        mailgun_message_id=email_result.get("message_id"),
-                        error_message=email_result.get("error"),
                     )
-                    db.add(email_record)
-                    db.commit()
-                    result["email_sent"] = email_result.get("success", False)
-                    return result
+                    if defer_send:
+                        return _defer_send(result, recent_contacts, "email", record, email_kwargs)
+                    return _claim_and_send(db, result, recent_contacts, "email", record, email_kwargs)
 
     if not policy:
         result["error"] = "Policy not found in database"
@@ -752,7 +1250,7 @@ def _process_single_policy(
     # First try local DB (fast path)
     policy_found = policy  # already found above
     if policy_found:
-        customer = db.query(Customer).filter(Customer.id == policy_found.customer_id).first()
+        customer = policy_found.customer
 
     # Only do NowCerts live lookup if local DB didn't find the customer
     # or if we want to verify/update the name (skip for speed during bulk uploads)
@@ -811,16 +1309,11 @@ def _process_single_policy(
         # No email — try sending a physical letter via Thanks.io
         if customer.address and customer.city and customer.state and customer.zip_code:
             # Check 1x/week rate limit for letters (applies in both dry_run and live)
-            one_week_ago = datetime.utcnow() - timedelta(days=7)
-            recent_letter = db.query(NonPayEmail).filter(
-                NonPayEmail.policy_number == policy_number,
-                NonPayEmail.email_status.in_(["letter_sent", "sent"]),
-                NonPayEmail.sent_at >= one_week_ago,
-            ).first()
-            if recent_letter:
+            last_sent = _recent_contact_at(db, policy_number, ("letter_sent", "sent"), recent_contacts)
+            if last_sent:
                 result["skipped_rate_limit"] = True
                 result["error"] = "Already contacted this week"
-                result["last_sent"] = recent_letter.sent_at.isoformat() if recent_letter.sent_at else None
+                result["last_sent"] = last_sent.isoformat()
                 return result
 
             if dry_run:
@@ -832,8 +1325,7 @@ def _process_single_policy(
             # Check 1x/week rate limit for letters too
             # (Already checked above for both dry_run and live)
 
-            from app.services.thanksio_letter import send_thanksio_letter
-            letter_result = send_thanksio_letter(
+            letter_kwargs = dict(
                 client_name=customer.full_name,
                 address=customer.address,
                 city=customer.city,
@@ -844,9 +1336,7 @@ def _process_single_policy(
                 amount_due=float(amount_due) if amount_due else None,
                 due_date=due_date,
             )
-
-            # Record the letter
-            letter_record = NonPayEmail(
+            record = dict(
                 notice_id=notice_id,
                 policy_number=policy_number,
                 customer_id=customer.id,
@@ -855,33 +1345,19 @@ def _process_single_policy(
                 carrier=carrier,
                 amount_due=amount_due,
                 due_date=due_date,
-                email_status="letter_sent" if letter_result.get("success") else "letter_failed",
-                mailgun_message_id=letter_result.get("order_id"),
-                error_message=letter_result.get("error"),
             )
-            db.add(letter_record)
-            db.commit()
-
-            result["letter_sent"] = letter_result.get("success", False)
-            result["letter_order_id"] = letter_result.get("order_id")
-            if not letter_result.get("success"):
-                result["error"] = letter_result.get("error")
-            return result
+            if defer_send:
+                return _defer_send(result, recent_contacts, "letter", record, letter_kwargs)
+            return _claim_and_send(db, result, recent_contacts, "letter", record, letter_kwargs)
         else:
             result["error"] = "No email and incomplete mailing address"
             return result
 
     # Check 1x/week rate limit for this policy
-    one_week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_email = db.query(NonPayEmail).filter(
-        NonPayEmail.policy_number == policy_number,
-        NonPayEmail.email_status == "sent",
-        NonPayEmail.sent_at >= one_week_ago,
-    ).first()
-
-    if recent_email:
+    last_sent = _recent_contact_at(db, policy_number, ("sent",), recent_contacts)
+    if last_sent:
         result["skipped_rate_limit"] = True
-        result["last_sent"] = recent_email.sent_at.isoformat() if recent_email.sent_at else None
+        result["last_sent"] = last_sent.isoformat()
         return result
 
     # Use carrier from policy record if not in the upload
@@ -895,68 +1371,91 @@ def _process_single_policy(
         return result
 
     # Send the email
-    # Record the email BEFORE sending (prevents duplicates on retry/timeout)
-    email_record = NonPayEmail(
-        notice_id=notice_id,
+    # Read customer fields now — the commit below expires ORM instances
+    email_kwargs = dict(
+        to_email=customer.email,
+        client_name=customer.full_name,
         policy_number=policy_number,
-        customer_id=customer.id,
-        customer_name=customer.full_name,
-        customer_email=customer.email,
         carrier=effective_carrier,
         amount_due=amount_due,
         due_date=due_date,
-        email_status="sent",  # Optimistic — prevents retries from resending
-        error_message=None,
+        cancel_date=cancel_date,
     )
-    db.add(email_record)
-    db.commit()
-
-    email_result = send_nonpay_email(
-        to_email=customer.email,
-        client_name=customer.full_name,
+    record = dict(
+        notice_id=notice_id,
         policy_number=policy_number,
+        customer_id=customer.id,
+        customer_name=email_kwargs["client_name"],
+        customer_email=email_kwargs["to_email"],
         carrier=effective_carrier,
         amount_due=amount_due,
         due_date=due_date,
-        cancel_date=cancel_date,
     )
+    if defer_send:
+        return _defer_send(result, recent_contacts, "email", record, email_kwargs)
+    return _claim_and_send(db, result, recent_contacts, "email", record, email_kwargs)
 
-    # Update with actual result
-    email_record.mailgun_message_id = email_result.get("message_id")
-    if not email_result.get("success"):
-        email_record.email_status = "failed"
-        email_record.error_message = email_result.get("error")
-    db.commit()
-
-    result["email_sent"] = email_result.get("success", False)
-    if not email_result.get("success"):
-        result["error"] = email_result.get("error")
 
-    return result
+# ── File Extraction ──────────────────────────────────────────────────
 
+# PDFs above this size are page-counted/truncated in a worker thread
+PDF_THREAD_THRESHOLD = 256 * 1024
 
-# ── File Extraction ──────────────────────────────────────────────────
 
-async def _extract_from_pdf(pdf_bytes: bytes) -> list[dict]:
-    """Use Claude API to extract policy info from a PDF."""
-    if not settings.ANTHROPIC_API_KEY:
-        raise ValueError("ANTHROPIC_API_KEY not configured")
+def _truncate_pdf(pdf_bytes: bytes, max_pages: int = 50):
+    """Return the PDF cut to max_pages, or the original bytes untouched.
 
-    # Truncate large PDFs
+    Only re-serializes through PdfWriter when pages are actually dropped;
+    the parsed reader/writer object graphs are released on return, before
+    the caller base64-encodes the result.
+    """
     try:
         from PyPDF2 import PdfReader, PdfWriter
         reader = PdfReader(io.BytesIO(pdf_bytes))
-        if len(reader.pages) > 50:
-            writer = PdfWriter()
-            for i in range(50):
-                writer.add_page(reader.pages[i])
-            buf = io.BytesIO()
-            writer.write(buf)
-            pdf_bytes = buf.getvalue()
+        if len(reader.pages) <= max_pages:
+            return pdf_bytes
+        writer = PdfWriter()
+        for i in range(max_pages):
+            writer.add_page(reader.pages[i])
+        buf = io.BytesIO()
+        writer.write(buf)
+        return buf.getbuffer()
     except Exception:
-        pass
+        return pdf_bytes
+
 
-    pdf_b64 = base64.standard_b64encode(pdf_bytes).decode("utf-8")
+# Extraction results by PDF sha256 (value=(JSON text, expires_at_ts)), so the
+# usual dry-run-then-send of one notice makes a single Claude call.
+# JSON text rather than parsed lists: callers mutate the returned policies.
+_PDF_EXTRACTION_CACHE: dict[bytes, tuple[str, float]] = {}
+_PDF_EXTRACTION_CACHE_TTL_SECONDS = 3600
+_PDF_EXTRACTION_CACHE_MAX = 32
+
+
+async def _extract_from_pdf(pdf_bytes: bytes, pdf_b64: str = "") -> list[dict]:
+    """Use Claude API to extract policy info from a PDF.
+
+    pdf_b64 may carry the base64 text pdf_bytes was decoded from; it is sent
+    as-is (no re-encode) when the PDF isn't truncated and the text is canonical.
+    """
+    if not settings.ANTHROPIC_API_KEY:
+        raise ValueError("ANTHROPIC_API_KEY not configured")
+
+    digest = hashlib.sha256(pdf_bytes).digest()
+    cached = _PDF_EXTRACTION_CACHE.get(digest)
+    if cached and cached[1] > time.time():
+        data = orjson.loads(cached[0])
+        return data if isinstance(data, list) else [data]
+
+    # PyPDF2 parses the xref/page tree in Python — seconds for big files
+    if len(pdf_bytes) > PDF_THREAD_THRESHOLD:
+        truncated = await asyncio.to_thread(_truncate_pdf, pdf_bytes)
+    else:
+        truncated = _truncate_pdf(pdf_bytes)
+    # Canonical base64 is exactly 4 chars per 3 bytes (padded); anything else
+    # had whitespace/junk that the lenient decoder skipped, so re-encode
+    if not (pdf_b64 and truncated is pdf_bytes and len(pdf_b64) == 4 * ((len(pdf_bytes) + 2) // 3)):
+        pdf_b64 = b64encode_pdf(truncated)
 
     async with httpx.AsyncClient(timeout=90.0) as client:
         response = await client.post(
@@ -982,84 +1481,84 @@ async def _extract_from_pdf(pdf_bytes: bytes) -> list[dict]:
     if response.status_code != 200:
         raise ValueError(f"Claude API error ({response.status_code}): {response.text[:300]}")
 
-    text = ""
-    for block in response.json().get("content", []):
-        if block.get("type") == "text":
-            text += block["text"]
-
-    text = text.strip()
-    for fence in ["```json", "```"]:
-        if text.startswith(fence):
-            text = text[len(fence):]
-    if text.endswith("```"):
-        text = text[:-3]
-    text = text.strip()
+    text = "".join(
+        block["text"]
+        for block in orjson.loads(response.content).get("content", [])
+        if block.get("type") == "text"
+    )
+    text = _JSON_FENCE_RE.sub("", text).strip()
 
     try:
-        data = json.loads(text)
-        return data if isinstance(data, list) else [data]
-    except json.JSONDecodeError as e:
+        data = orjson.loads(text)
+    except orjson.JSONDecodeError as e:
         raise ValueError(f"Failed to parse extraction: {e}\nRaw: {text[:500]}")
 
+    if len(_PDF_EXTRACTION_CACHE) >= _PDF_EXTRACTION_CACHE_MAX:
+        _PDF_EXTRACTION_CACHE.pop(next(iter(_PDF_EXTRACTION_CACHE)))
+    _PDF_EXTRACTION_CACHE[digest] = (text, time.time() + _PDF_EXTRACTION_CACHE_TTL_SECONDS)
+    return data if isinstance(data, list) else [data]
+
+
+def _parse_money(value) -> Optional[float]:
+    """Parse an amount like "$1,234.50" (or a numeric cell) into a float, or None."""
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", "").replace("$", ""))
+        except ValueError:
+            return None
+    if isinstance(value, (int, float)):
+        # Spreadsheet readers already hand back numeric cells as numbers
+        return float(value)
+    return None
+
 
 def _extract_from_csv(file_bytes: bytes) -> list[dict]:
     """Parse CSV/TSV to extract policy numbers and amounts."""
     text = file_bytes.decode("utf-8", errors="replace")
 
-    # Detect delimiter
-    if "\t" in text.split("\n")[0]:
+    # Detect delimiter from the header line (find() avoids splitting the whole file)
+    eol = text.find("\n")
+    if "\t" in (text if eol < 0 else text[:eol]):
         delimiter = "\t"
     else:
         delimiter = ","
 
-    reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
     results = []
 
-    # Common column name patterns
-    policy_cols = ["policy_number", "policynumber", "policy #", "policy#", "policy no",
-                   "policyno", "policy", "pol_number", "pol_num", "pol#", "number"]
-    carrier_cols = ["carrier", "carrier_name", "carriername", "company", "insurer", "insurance_company"]
-    name_cols = ["insured_name", "insuredname", "name", "client", "customer", "policyholder",
-                 "insured", "named_insured", "named insured", "first name", "first_name"]
-    amount_cols = ["amount_due", "amountdue", "amount", "balance", "premium_due", "premiumdue",
-                   "past_due", "pastdue", "total_due", "totaldue", "premium",
-                   "minimum_due", "remaining_balance", "amount_to_reinstate"]
-    date_cols = ["due_date", "duedate", "cancel_date", "canceldate", "effective_date",
-                 "cancellation_date", "cancellationdate",
-                 "payment_due_date", "cancellation_effective_date"]
-
-    def _find_col(fieldnames, patterns):
-        for f in (fieldnames or []):
-            fl = f.lower().strip().replace(" ", "_")
-            if fl in patterns:
-                return f
-        return None
+    # Header is the first non-blank row (as DictReader would pick it)
+    header_row = next(reader, None)
+    while header_row == []:
+        header_row = next(reader, None)
+    if header_row is None:
+        return results
+
+    # Same column names as spreadsheets; resolve positions once
+    headers = tuple(h.lower().strip().replace(" ", "_") for h in header_row)
+    p_col, c_col, n_col, a_col, d_col = _resolve_cols(headers)[:5]
+
+    if p_col is None:
+        return results
 
-    fields = reader.fieldnames or []
-    p_col = _find_col(fields, policy_cols)
-    c_col = _find_col(fields, carrier_cols)
-    n_col = _find_col(fields, name_cols)
-    a_col = _find_col(fields, amount_cols)
-    d_col = _find_col(fields, date_cols)
+    # Pad short rows once so the lookups below can index directly
+    width = max(c for c in (p_col, c_col, n_col, a_col, d_col) if c is not None) + 1
 
     for row in reader:
-        pnum = row.get(p_col, "").strip() if p_col else ""
+        if len(row) < width:
+            row += [""] * (width - len(row))
+
+        pnum = row[p_col].strip()
         if not pnum:
             continue
 
-        amt = None
-        if a_col and row.get(a_col):
-            try:
-                amt = float(row[a_col].replace(",", "").replace("$", "").strip())
-            except (ValueError, AttributeError):
-                pass
+        amt = _parse_money(row[a_col]) if a_col is not None and row[a_col] else None
 
         results.append({
             "policy_number": pnum,
-            "carrier": row.get(c_col, "").strip() if c_col else "",
-            "insured_name": row.get(n_col, "").strip() if n_col else "",
+            "carrier": row[c_col].strip() if c_col is not None else "",
+            "insured_name": row[n_col].strip() if n_col is not None else "",
             "amount_due": amt,
-            "due_date": row.get(d_col, "").strip() if d_col else "",
+            "due_date": row[d_col].strip() if d_col is not None else "",
             "notice_type": "non-pay",
         })
 
@@ -1190,30 +1689,31 @@ def _detect_progressive_file(file_bytes: bytes, ext: str, filename: str = "") ->
     return None
 
 
+_PROGRESSIVE_COL_PATTERNS = {
+    "policy_number": frozenset(["policy number", "policy", "policy no"]),
+    "insured_name": frozenset(["full name", "named insured", "name", "insured"]),
+    "email": frozenset(["email address", "email"]),
+    "phone": frozenset(["phone number", "phone", "phone #"]),
+    "address": frozenset(["address"]),
+    "city": frozenset(["city"]),
+    "state": frozenset(["state", "policy state"]),
+    "zip": frozenset(["zip", "zip code"]),
+    "product": frozenset(["product"]),
+    "producer": frozenset(["producer"]),
+    "agent_code": frozenset(["agent code"]),
+    "amount_due": frozenset(["amount due", "amount"]),
+    "cancel_date": frozenset(["cancel effective date", "cancel date", "cancellation date"]),
+    "cancel_reason": frozenset(["cancel reason", "reason"]),
+    "reference_number": frozenset(["reference number"]),
+}
+
+
 def _progressive_col_map(headers: list[str]) -> dict:
     """Map Progressive column headers to standard field names."""
     headers_lower = [h.lower().strip() for h in headers]
     col_map = {}
 
-    mappings = {
-        "policy_number": ["policy number", "policy", "policy no"],
-        "insured_name": ["full name", "named insured", "name", "insured"],
-        "email": ["email address", "email"],
-        "phone": ["phone number", "phone", "phone #"],
-        "address": ["address"],
-        "city": ["city"],
-        "state": ["state", "policy state"],
-        "zip": ["zip", "zip code"],
-        "product": ["product"],
-        "producer": ["producer"],
-        "agent_code": ["agent code"],
-        "amount_due": ["amount due", "amount"],
-        "cancel_date": ["cancel effective date", "cancel date", "cancellation date"],
-        "cancel_reason": ["cancel reason", "reason"],
-        "reference_number": ["reference number"],
-    }
-
-    for field, patterns in mappings.items():
+    for field, patterns in _PROGRESSIVE_COL_PATTERNS.items():
         for i, h in enumerate(headers_lower):
             if h in patterns:
                 col_map[field] = i
@@ -1239,13 +1739,8 @@ def _progressive_row_to_dict(cells: list, col_map: dict, headers: list) -> dict:
         name = raw_name
 
     # Parse amount
-    amount = None
     raw_amt = _get("amount_due")
-    if raw_amt:
-        try:
-            amount = float(raw_amt.replace(",", "").replace("$", ""))
-        except (ValueError, TypeError):
-            pass
+    amount = _parse_money(raw_amt) if raw_amt else None
 
     # Parse cancel date and compute payment due date (day before cancellation)
     raw_cancel = _get("cancel_date")
@@ -1368,122 +1863,346 @@ def _process_progressive_uw_items(db: Session, uw_items: list[dict], dry_run: bo
                 logger.warning("UW email failed for %s: %s", policy_number, e)
 
 
-def _extract_from_excel(file_bytes: bytes, ext: str) -> list[dict]:
-    """Extract policy data from .xlsx or .xls files."""
-    import io
+# ── Streaming XLSX reader ────────────────────────────────────────────
+# Reads the active sheet straight out of the zip with ElementTree.iterparse
+# instead of building openpyxl's per-cell object model. Values match
+# openpyxl's data_only=True output: numbers → int/float, date-styled numbers
+# → datetime, shared/inline strings → str, booleans → bool.
 
-    # Column name patterns (same as CSV)
-    policy_pats = ["policy_number", "policynumber", "policy #", "policy#", "policy no",
-                   "policyno", "policy", "pol_number", "pol_num", "pol#", "number"]
-    carrier_pats = ["carrier", "carrier_name", "carriername", "company", "insurer", "insurance_company"]
-    name_pats = ["insured_name", "insuredname", "name", "client", "customer", "policyholder",
-                 "insured", "named_insured", "named insured", "first name", "first_name"]
-    amount_pats = ["amount_due", "amountdue", "amount", "balance", "premium_due", "premiumdue",
-                   "past_due", "pastdue", "total_due", "totaldue", "premium",
-                   "minimum_due", "remaining_balance", "amount_to_reinstate"]
-    date_pats = ["due_date", "duedate", "cancel_date", "canceldate", "effective_date",
-                 "cancellation_date", "cancellationdate",
-                 "payment_due_date", "cancellation_effective_date"]
-    reason_pats = ["reason", "cancel_reason", "cancellation_reason", "cancel_type",
-                   "notice_reason", "status", "cancellation_status"]
-    phone_pats = ["phone", "phone_#", "phone_number", "phonenumber", "phone_no",
-                  "telephone", "cell", "mobile"]
-
-    def _match_col(headers, patterns):
-        for i, h in enumerate(headers):
-            if h and str(h).lower().strip().replace(" ", "_") in patterns:
-                return i
-        return None
+_XLSX_BUILTIN_DATE_FMTS = {14, 15, 16, 17, 18, 19, 20, 21, 22, 45, 46, 47}
+_XLSX_BUILTIN_TIMEDELTA_FMTS = {46}
+_XLSX_FMT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_XLSX_DATE_TOKEN_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+_XLSX_TIMEDELTA_RE = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.I)
+_XLSX_WINDOWS_EPOCH = datetime(1899, 12, 30)
+_XLSX_MAC_EPOCH = datetime(1904, 1, 1)
 
-    results = []
 
+def _xml_local(tag: str) -> str:
+    """Strip the {namespace} prefix from an ElementTree tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _xlsx_rels(zf: zipfile.ZipFile, rels_path: str, base_dir: str) -> dict:
+    """Map relationship Id → (type suffix, zip path) for a .rels part."""
+    rels = {}
+    for el in ET.fromstring(zf.read(rels_path)):
+        target = el.get("Target", "")
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join(base_dir, target))
+        rels[el.get("Id")] = (el.get("Type", "").rsplit("/", 1)[-1], path)
+    return rels
+
+
+def _xlsx_text(el) -> str:
+    """Text of an <si>/<is> string item: plain <t> or rich-text runs (phonetic runs skipped)."""
+    parts = []
+    for child in el:
+        name = _xml_local(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(t.text or "" for t in child if _xml_local(t.tag) == "t")
+    return "".join(parts)
+
+
+def _xlsx_shared_strings(zf: zipfile.ZipFile, path: Optional[str]) -> list[str]:
+    """Parse sharedStrings.xml into a plain list (rich-text runs concatenated)."""
+    if not path or path not in zf.namelist():
+        return []
+    strings = []
+    with zf.open(path) as fh:
+        for _, el in ET.iterparse(fh):
+            if _xml_local(el.tag) != "si":
+                continue
+            strings.append(_xlsx_text(el))
+            el.clear()
+    return strings
+
+
+def _xlsx_date_styles(zf: zipfile.ZipFile, path: Optional[str]) -> tuple[set, set]:
+    """Return (date style ids, timedelta style ids) from styles.xml."""
+    if not path or path not in zf.namelist():
+        return set(), set()
+    root = ET.fromstring(zf.read(path))
+    custom = {}
+    xf_fmt_ids = []
+    for el in root:
+        name = _xml_local(el.tag)
+        if name == "numFmts":
+            for fmt in el:
+                custom[int(fmt.get("numFmtId", 0))] = fmt.get("formatCode", "")
+        elif name == "cellXfs":
+            xf_fmt_ids = [int(xf.get("numFmtId", 0)) for xf in el]
+
+    date_styles, timedelta_styles = set(), set()
+    for idx, fmt_id in enumerate(xf_fmt_ids):
+        if fmt_id in custom:
+            code = custom[fmt_id].split(";")[0]
+            is_date = _XLSX_DATE_TOKEN_RE.search(_XLSX_FMT_STRIP_RE.sub("", code)) is not None
+            is_timedelta = _XLSX_TIMEDELTA_RE.search(code) is not None
+        else:
+            is_date = fmt_id in _XLSX_BUILTIN_DATE_FMTS
+            is_timedelta = fmt_id in _XLSX_BUILTIN_TIMEDELTA_FMTS
+        if is_date:
+            date_styles.add(idx)
+            if is_timedelta:
+                timedelta_styles.add(idx)
+    return date_styles, timedelta_styles
+
+
+def _xlsx_serial_to_datetime(value: float, epoch: datetime, as_timedelta: bool):
+    """Convert an Excel date serial the same way openpyxl.utils.datetime.from_excel does."""
+    if as_timedelta:
+        return timedelta(milliseconds=round(value * 86400 * 1000))
+    day, fraction = divmod(value, 1)
+    diff = timedelta(milliseconds=round(fraction * 86400 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        return (datetime.min + diff).time()
+    if 0 < value < 60 and epoch == _XLSX_WINDOWS_EPOCH:
+        day += 1
+    return epoch + timedelta(days=day) + diff
+
+
+def _xlsx_col_index(ref: str) -> int:
+    """0-based column index from a cell reference like "AB12"."""
+    idx = 0
+    for ch in ref:
+        if ch.isdigit():
+            break
+        idx = idx * 26 + (ord(ch.upper()) - 64)
+    return idx - 1
+
+
+def _iter_xlsx_rows(file_bytes: bytes):
+    """Yield the active sheet's rows as tuples of cell values.
+
+    Missing rows are yielded as empty tuples and missing cells as None,
+    matching openpyxl's read_only iter_rows(values_only=True).
+    """
+    with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+        wb_root = ET.fromstring(zf.read("xl/workbook.xml"))
+        active = 0
+        sheet_rids = []
+        epoch = _XLSX_WINDOWS_EPOCH
+        seen_view = False
+        for el in wb_root.iter():
+            name = _xml_local(el.tag)
+            if name == "workbookPr" and el.get("date1904") in ("1", "true"):
+                epoch = _XLSX_MAC_EPOCH
+            elif name == "workbookView" and not seen_view:
+                seen_view = True
+                active = int(el.get("activeTab", 0) or 0)
+            elif name == "sheet":
+                sheet_rids.append(next((v for k, v in el.attrib.items() if k.endswith("}id")), None))
+
+        rels = _xlsx_rels(zf, "xl/_rels/workbook.xml.rels", "xl")
+        parts = {rtype: path for rtype, path in rels.values()}
+        sheet_path = rels[sheet_rids[min(active, len(sheet_rids) - 1)]][1]
+        shared = _xlsx_shared_strings(zf, parts.get("sharedStrings", "xl/sharedStrings.xml"))
+        date_styles, timedelta_styles = _xlsx_date_styles(zf, parts.get("styles", "xl/styles.xml"))
+
+        with zf.open(sheet_path) as fh:
+            sheet_data = None
+            expected_row = 1
+            for event, el in ET.iterparse(fh, events=("start", "end")):
+                name = _xml_local(el.tag)
+                if event == "start":
+                    if name == "sheetData":
+                        sheet_data = el
+                    continue
+                if name != "row":
+                    continue
+
+                row_num = int(el.get("r") or expected_row)
+                while expected_row < row_num:
+                    yield ()
+                    expected_row += 1
+                expected_row = row_num + 1
+
+                values = []
+                for c in el:
+                    if _xml_local(c.tag) != "c":
+                        continue
+                    ref = c.get("r")
+                    col = _xlsx_col_index(ref) if ref else len(values)
+                    if col > len(values):
+                        values.extend([None] * (col - len(values)))
+
+                    ctype = c.get("t", "n")
+                    raw = None
+                    inline = None
+                    for child in c:
+                        cname = _xml_local(child.tag)
+                        if cname == "v":
+                            raw = child.text or None
+                        elif cname == "is":
+                            inline = _xlsx_text(child)
+
+                    if ctype == "inlineStr":
+                        value = inline
+                    elif raw is None:
+                        value = None
+                    elif ctype == "n":
+                        value = float(raw) if ("." in raw or "E" in raw or "e" in raw) else int(raw)
+                        style = int(c.get("s") or 0)
+                        if style in date_styles:
+                            try:
+                                value = _xlsx_serial_to_datetime(value, epoch, style in timedelta_styles)
+                            except (OverflowError, ValueError):
+                                value = "#VALUE!"
+                    elif ctype == "s":
+                        value = shared[int(raw)]
+                    elif ctype == "b":
+                        value = bool(int(raw))
+                    elif ctype == "d":
+                        value = datetime.fromisoformat(raw.rstrip("Z"))
+                    else:  # "str" (formula result), "e" (error)
+                        value = raw
+                    values.append(value)
+
+                yield tuple(values)
+                # Drop the parsed row so memory stays flat on large sheets
+                el.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+
+# Spreadsheet header names (normalized: lowercase, stripped, spaces → "_");
+# _extract_from_csv matches against the same sets
+_EXCEL_POLICY_COLS = frozenset(["policy_number", "policynumber", "policy #", "policy#", "policy no",
+                                "policyno", "policy", "pol_number", "pol_num", "pol#", "number"])
+_EXCEL_CARRIER_COLS = frozenset(["carrier", "carrier_name", "carriername", "company", "insurer",
+                                 "insurance_company"])
+_EXCEL_NAME_COLS = frozenset(["insured_name", "insuredname", "name", "client", "customer", "policyholder",
+                              "insured", "named_insured", "named insured", "first name", "first_name"])
+_EXCEL_AMOUNT_COLS = frozenset(["amount_due", "amountdue", "amount", "balance", "premium_due", "premiumdue",
+                                "past_due", "pastdue", "total_due", "totaldue", "premium",
+                                "minimum_due", "remaining_balance", "amount_to_reinstate"])
+_EXCEL_DATE_COLS = frozenset(["due_date", "duedate", "cancel_date", "canceldate", "effective_date",
+                              "cancellation_date", "cancellationdate",
+                              "payment_due_date", "cancellation_effective_date"])
+_EXCEL_REASON_COLS = frozenset(["reason", "cancel_reason", "cancellation_reason", "cancel_type",
+                                "notice_reason", "status", "cancellation_status"])
+_EXCEL_PHONE_COLS = frozenset(["phone", "phone_#", "phone_number", "phonenumber", "phone_no",
+                               "telephone", "cell", "mobile"])
+
+
+def _match_col(headers_norm, patterns: frozenset) -> Optional[int]:
+    """Index of the first normalized header found in patterns, or None."""
+    for i, h in enumerate(headers_norm):
+        if h and h in patterns:
+            return i
+    return None
+
+
+@lru_cache(maxsize=64)
+def _resolve_cols(headers_norm: tuple[str, ...]) -> tuple[Optional[int], ...]:
+    """Column indices (policy, carrier, name, amount, date, reason, phone) for a header row.
+
+    Cached: carrier exports reuse the same few header layouts.
+    """
+    return (
+        _match_col(headers_norm, _EXCEL_POLICY_COLS),
+        _match_col(headers_norm, _EXCEL_CARRIER_COLS),
+        _match_col(headers_norm, _EXCEL_NAME_COLS),
+        _match_col(headers_norm, _EXCEL_AMOUNT_COLS),
+        _match_col(headers_norm, _EXCEL_DATE_COLS),
+        _match_col(headers_norm, _EXCEL_REASON_COLS),
+        _match_col(headers_norm, _EXCEL_PHONE_COLS),
+    )
+
+
+@lru_cache(maxsize=1024)
+def _excel_notice_type(reason_raw: str) -> str:
+    """Classify a spreadsheet cancel reason. Cached: a sheet has few distinct reasons."""
+    notice_type = _classify_notice_type(reason_raw.lower(), _EXCEL_NOTICE_TYPE_RULES)
+    if notice_type is None:
+        # "other" for an unrecognised reason; non-pay if no reason column
+        notice_type = "other" if reason_raw else "non-pay"
+    return notice_type
+
+
+def _extract_from_excel(file_bytes: bytes, ext: str) -> list[dict]:
+    """Extract policy data from .xlsx or .xls files."""
+    # Rows are consumed as a stream — the sheet is never held in memory whole
     if ext == "xlsx":
-        import openpyxl
-        wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
-        ws = wb.active
-        rows = list(ws.iter_rows(values_only=True))
+        try:
+            return _extract_from_rows(_iter_xlsx_rows(file_bytes))
+        except Exception as e:
+            # Unusual package layout or cell — re-read the whole sheet with openpyxl
+            logger.warning("Streaming xlsx read failed, falling back to openpyxl: %s", e)
+            import openpyxl
+            wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+            return _extract_from_rows(wb.active.iter_rows(values_only=True))
     else:  # xls
         try:
             import xlrd
-            wb = xlrd.open_workbook(file_contents=file_bytes)
+            # on_demand: only the first sheet gets parsed into memory
+            wb = xlrd.open_workbook(file_contents=file_bytes, on_demand=True)
             ws = wb.sheet_by_index(0)
-            rows = [ws.row_values(r) for r in range(ws.nrows)]
+            rows = (ws.row_values(r) for r in range(ws.nrows))
         except ImportError:
             # xlrd not installed — try reading as CSV (some .xls are actually HTML/CSV)
             try:
                 text = file_bytes.decode("utf-8", errors="ignore")
-                reader = csv.reader(io.StringIO(text), delimiter="\t")
-                rows = [row for row in reader]
+                rows = csv.reader(io.StringIO(text), delimiter="\t")
             except Exception:
                 raise ValueError("XLS support requires xlrd package. Please convert to XLSX or CSV.")
         except Exception as e:
             raise ValueError(f"Failed to read XLS file: {str(e)}")
+        return _extract_from_rows(rows)
 
-    if not rows:
+
+def _extract_from_rows(rows) -> list[dict]:
+    """Extract policy data from spreadsheet rows; the first row is the header."""
+    results = []
+    header_row = next(rows, None)
+    if header_row is None:
         return results
 
-    headers = [str(c).strip() if c else "" for c in rows[0]]
-    p_col = _match_col(headers, policy_pats)
-    c_col = _match_col(headers, carrier_pats)
-    n_col = _match_col(headers, name_pats)
-    a_col = _match_col(headers, amount_pats)
-    d_col = _match_col(headers, date_pats)
-    r_col = _match_col(headers, reason_pats)
-    ph_col = _match_col(headers, phone_pats)
-
-    for row in rows[1:]:
-        cells = list(row)
-        pnum = str(cells[p_col]).strip() if p_col is not None and p_col < len(cells) and cells[p_col] else ""
+    headers = tuple(str(c).lower().strip().replace(" ", "_") if c else "" for c in header_row)
+    p_col, c_col, n_col, a_col, d_col, r_col, ph_col = _resolve_cols(headers)
+
+    # Pad ragged rows up to the last mapped column once, so the per-field
+    # lookups below only need the "column mapped?" check
+    width = max((c for c in (p_col, c_col, n_col, a_col, d_col, r_col, ph_col) if c is not None), default=-1) + 1
+    _str = str
+    # Carrier, date and reason values repeat down a sheet; keep one string
+    # object per distinct value instead of one per row
+    _shared = {}.setdefault
+
+    for cells in rows:
+        if len(cells) < width:
+            cells = (*cells, *(None,) * (width - len(cells)))
+
+        pnum = _str(cells[p_col]).strip() if p_col is not None and cells[p_col] else ""
         if not pnum or pnum.lower() == "none":
             continue
 
-        amt = None
-        if a_col is not None and a_col < len(cells) and cells[a_col]:
-            try:
-                val = cells[a_col]
-                if isinstance(val, (int, float)):
-                    amt = float(val)
-                else:
-                    amt = float(str(val).replace(",", "").replace("$", "").strip())
-            except (ValueError, TypeError):
-                pass
+        amt = _parse_money(cells[a_col]) if a_col is not None and cells[a_col] else None
 
         # Extract cancellation reason
-        reason_raw = ""
-        if r_col is not None and r_col < len(cells) and cells[r_col]:
-            reason_raw = str(cells[r_col]).strip()
+        reason_raw = _str(cells[r_col]).strip() if r_col is not None and cells[r_col] else ""
+        reason_raw = _shared(reason_raw, reason_raw)
 
         # Classify the reason
-        reason_lower = reason_raw.lower()
-        if any(kw in reason_lower for kw in ["non payment", "non-payment", "nonpayment", "nsf",
-                                              "non pay", "non-pay", "nonpay",
-                                              "insufficient funds", "returned payment",
-                                              "offer", "pending cancellation"]):
-            notice_type = "non-pay"
-        elif any(kw in reason_lower for kw in ["underwriting", "uw reason"]):
-            notice_type = "underwriting"
-        elif any(kw in reason_lower for kw in ["policyholder", "insured request", "customer request",
-                                                "rewrite", "replacement", "policyholder's request"]):
-            notice_type = "voluntary"
-        elif reason_raw:
-            notice_type = "other"
-        else:
-            notice_type = "non-pay"  # default if no reason column
+        notice_type = _excel_notice_type(reason_raw)
 
-        # Extract phone
-        phone = ""
-        if ph_col is not None and ph_col < len(cells) and cells[ph_col]:
-            phone = str(cells[ph_col]).strip()
+        carrier = _str(cells[c_col]).strip() if c_col is not None and cells[c_col] else ""
+        due_date = _str(cells[d_col]).strip() if d_col is not None and cells[d_col] else ""
 
         results.append({
             "policy_number": pnum,
-            "carrier": str(cells[c_col]).strip() if c_col is not None and c_col < len(cells) and cells[c_col] else "",
-            "insured_name": str(cells[n_col]).strip() if n_col is not None and n_col < len(cells) and cells[n_col] else "",
+            "carrier": _shared(carrier, carrier),
+            "insured_name": _str(cells[n_col]).strip() if n_col is not None and cells[n_col] else "",
             "amount_due": amt,
-            "due_date": str(cells[d_col]).strip() if d_col is not None and d_col < len(cells) and cells[d_col] else "",
+            "due_date": _shared(due_date, due_date),
             "notice_type": notice_type,
             "cancel_reason": reason_raw,
-            "phone": phone,
+            "phone": _str(cells[ph_col]).strip() if ph_col is not None and cells[ph_col] else "",
         })
 
     return results
@@ -1499,63 +2218,75 @@ from fastapi import Request, Form
 # Start with dry_run, switch to live after first week
 INBOUND_NONPAY_MODE = os.environ.get("INBOUND_NONPAY_MODE", "dry_run")
 
+# libxml2 HTML parser for carrier alert emails (input is always re-encoded as UTF-8)
+_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
 # Subject line keywords that indicate non-pay notices
 NONPAY_SUBJECT_KEYWORDS = ["non pay", "non-pay", "nonpay", "nsf", "non payment", "non-payment"]
 SKIP_SUBJECT_KEYWORDS = ["underwriting", "policyholder request", "rewrite", "replacement"]
 
+# Carrier detection for inbound emails, in priority order. Each rule is
+# (keywords that must all appear, carrier slug).
+_INBOUND_CARRIER_RULES = (
+    (("grange",), "grange"),
+    (("travelers",), "travelers"),
+    (("progressive",), "progressive"),
+    (("safeco",), "safeco"),
+    (("national", "general"), "national_general"),
+)
+_GENERIC_CARRIER_RULES = tuple(
+    ((key,), key.replace(" ", "_"))
+    for key in ["travelers", "progressive", "safeco", "national general",
+                "bristol west", "hippo", "branch", "clearcover"]
+)
+
+
+def _contains_any(keywords, *texts: str) -> bool:
+    """True if any keyword appears in any of the given (lowercased) texts."""
+    return any(kw in t for t in texts for kw in keywords)
+
+
+def _carrier_from_text(texts: tuple[str, ...], rules) -> str:
+    """Return the first carrier whose keywords all appear in any of the (lowercased) texts."""
+    for keys, carrier in rules:
+        if all(any(k in t for t in texts) for k in keys):
+            return carrier
+    return ""
+
+
+def _html_table_rows(html_body: str) -> list[list[str]]:
+    """Return the text of every leaf table row (<tr> with no nested table).
+
+    Layout tables wrapping the data table are skipped, as are empty rows;
+    <br> inside a cell becomes a space.
+    """
+    if not html_body or not html_body.strip():
+        return []
+    try:
+        tree = lxml.html.fromstring(html_body.encode("utf-8"), parser=_HTML_PARSER)
+    except (etree.ParserError, ValueError):
+        return []
+
+    for br in tree.iter("br"):
+        br.tail = " " + (br.tail or "")
+
+    rows = []
+    for tr in tree.xpath("//table//tr[not(.//table)]"):
+        cells = [cell.text_content().strip() for cell in tr.xpath("./td|./th")]
+        if cells:
+            rows.append(cells)
+    return rows
+
 
 def _parse_grangewire_html(html_body: str) -> list[dict]:
     """Parse GrangeWire Alerts HTML table into policy records."""
-    from html.parser import HTMLParser
-
-    class TableParser(HTMLParser):
-        def __init__(self):
-            super().__init__()
-            self.in_table = False
-            self.in_row = False
-            self.in_cell = False
-            self.current_row = []
-            self.current_cell = ""
-            self.rows = []
-            self.table_count = 0
-
-        def handle_starttag(self, tag, attrs):
-            if tag == "table":
-                self.in_table = True
-                self.table_count += 1
-            elif tag == "tr" and self.in_table:
-                self.in_row = True
-                self.current_row = []
-            elif tag in ("td", "th") and self.in_row:
-                self.in_cell = True
-                self.current_cell = ""
-            elif tag == "br" and self.in_cell:
-                self.current_cell += " "
-
-        def handle_endtag(self, tag):
-            if tag == "table":
-                self.in_table = False
-            elif tag == "tr" and self.in_row:
-                self.in_row = False
-                if self.current_row:
-                    self.rows.append(self.current_row)
-            elif tag in ("td", "th") and self.in_cell:
-                self.in_cell = False
-                self.current_row.append(self.current_cell.strip())
-
-        def handle_data(self, data):
-            if self.in_cell:
-                self.current_cell += data
-
-    parser = TableParser()
-    parser.feed(html_body)
-
-    if not parser.rows:
+    rows = _html_table_rows(html_body)
+    if not rows:
         return []
 
     # Find the header row — look for one containing "POLICY" or "ACCT"
     header_idx = None
-    for i, row in enumerate(parser.rows):
+    for i, row in enumerate(rows):
         row_text = " ".join(row).upper()
         if "POLICY" in row_text or "ACCT" in row_text:
             header_idx = i
@@ -1564,7 +2295,7 @@ def _parse_grangewire_html(html_body: str) -> list[dict]:
     if header_idx is None:
         return []
 
-    headers = [h.upper().strip() for h in parser.rows[header_idx]]
+    headers = [h.upper().strip() for h in rows[header_idx]]
 
     # Map columns
     def _find_col(headers, keywords):
@@ -1583,7 +2314,7 @@ def _parse_grangewire_html(html_body: str) -> list[dict]:
     phone_col = _find_col(headers, ["PHONE", "EMAIL"])
 
     results = []
-    for row in parser.rows[header_idx + 1:]:
+    for row in rows[header_idx + 1:]:
         if not row or len(row) <= (p_col or 0):
             continue
 
@@ -1595,23 +2326,14 @@ def _parse_grangewire_html(html_body: str) -> list[dict]:
         amount = None
         for col in [max_col, min_col]:
             if col is not None and col < len(row) and row[col]:
-                try:
-                    amount = float(row[col].replace(",", "").replace("$", "").strip())
+                amount = _parse_money(row[col])
+                if amount is not None:
                     break
-                except (ValueError, TypeError):
-                    pass
 
         # Parse message to determine notice type
         message = row[msg_col].strip() if msg_col is not None and msg_col < len(row) else ""
-        msg_lower = message.lower()
-        if any(kw in msg_lower for kw in ["non pay", "non-pay", "nsf", "offer", "pending cancellation"]):
-            notice_type = "non-pay"
-        elif any(kw in msg_lower for kw in ["underwriting"]):
-            notice_type = "underwriting"
-        elif any(kw in msg_lower for kw in ["policyholder", "rewrite"]):
-            notice_type = "voluntary"
-        else:
-            notice_type = "non-pay"  # default for Grange non-pay alerts
+        # default non-pay for Grange non-pay alerts
+        notice_type = _classify_notice_type(message.lower(), _GRANGE_NOTICE_TYPE_RULES) or "non-pay"
 
         results.append({
             "policy_number": pnum,
@@ -1627,18 +2349,15 @@ def _parse_grangewire_html(html_body: str) -> list[dict]:
     return results
 
 
-def _parse_generic_email_html(html_body: str, carrier: str = "") -> list[dict]:
+def _parse_generic_email_html(html_body: str, carrier: str = "", body_lower: Optional[str] = None) -> list[dict]:
     """Fallback parser for non-Grange carrier email tables."""
     # Try the same table parsing approach
     policies = _parse_grangewire_html(html_body)
     if policies and not carrier:
         # Try to detect carrier from email body
-        body_lower = html_body.lower()
-        for key in ["travelers", "progressive", "safeco", "national general",
-                     "bristol west", "hippo", "branch", "clearcover"]:
-            if key in body_lower:
-                carrier = key.replace(" ", "_")
-                break
+        if body_lower is None:
+            body_lower = html_body.lower()
+        carrier = _carrier_from_text((body_lower,), _GENERIC_CARRIER_RULES)
     for p in policies:
         if carrier and not p.get("carrier"):
             p["carrier"] = carrier
@@ -1673,20 +2392,17 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
 
     logger.info("Inbound email from=%s subject=%s", sender, subject[:80])
 
-    # Determine if this is a non-pay notice
-    # Check subject line first, then fall back to scanning the HTML body
-    # (Forwarded emails often have generic subjects like "Fwd: GrangeWire Alerts")
     subject_lower = subject.lower()
-    html_lower = (html_body or "").lower()
-    plain_lower = (plain_body or "").lower()
-    all_text = f"{subject_lower} {html_lower} {plain_lower}"
 
     # ── National General Policy Activity → smart router ──
-    is_natgen_activity = (
-        ("policy activity" in subject_lower and ("ngic" in all_text or "national general" in all_text))
-        or ("reports@ngic.com" in (sender or "").lower())
-        or ("policy activity" in subject_lower and "outstanding to do" in html_lower)
-    )
+    # Only a "policy activity" subject needs the (large) bodies lowercased here
+    is_natgen_activity = "reports@ngic.com" in (sender or "").lower()
+    if not is_natgen_activity and "policy activity" in subject_lower:
+        body_lower = (html_body or "").lower()
+        is_natgen_activity = (
+            _contains_any(("ngic", "national general"), subject_lower, body_lower, (plain_body or "").lower())
+            or "outstanding to do" in body_lower
+        )
     if is_natgen_activity:
         logger.info("NatGen Policy Activity detected — routing through smart parser")
         try:
@@ -1698,8 +2414,8 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
             # Fall through to generic handler
 
     # ── Carrier Inspection Follow-Ups → inspection handler ──
-    # Must run BEFORE Grange non-renewal check because inspection emails
-    # can contain "non renewal" in warning text
+    # Must run BEFORE the non-pay keyword checks because inspection emails
+    # can contain cancellation/"non renewal" warning text
     from app.services.inspection_email import is_inspection_email, handle_inspection_email
     if is_inspection_email(sender, subject, f"{html_body} {plain_body}"):
         logger.info("Carrier inspection email detected — routing to inspection handler")
@@ -1727,43 +2443,32 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
             traceback.print_exc()
             # Fall through to generic handler
 
-    # ── Grange Non-Renewal Alerts → non-renewal handler ──
-    # Only match actual GrangeWire Alert emails, not inspection follow-ups
-    is_grange_nonrenewal = (
-        ("grangewire" in all_text or "grange" in (sender or "").lower())
-        and ("non-renewal" in all_text or "nonrenewal" in all_text or "non renewal" in all_text)
-        and ("grangewire" in all_text or "non-renewal alert" in all_text or "non-renewals alert" in all_text)
-    )
+    # Determine if this is a non-pay notice
+    # Check subject line first, then fall back to scanning the HTML body
+    # (Forwarded emails often have generic subjects like "Fwd: GrangeWire Alerts")
+    html_lower = (html_body or "").lower()
 
     # Check for skip keywords in subject
-    if any(kw in subject_lower for kw in SKIP_SUBJECT_KEYWORDS):
+    if _contains_any(SKIP_SUBJECT_KEYWORDS, subject_lower):
         # But only skip if the body doesn't ALSO contain non-pay content
-        if not any(kw in html_lower for kw in NONPAY_SUBJECT_KEYWORDS):
+        if not _contains_any(NONPAY_SUBJECT_KEYWORDS, html_lower):
             logger.info("Inbound email skipped (subject keyword): %s", subject[:80])
             return {"status": "skipped", "reason": "Subject indicates non-actionable notice type"}
-
-    # Check for non-pay keywords in subject OR body
-    is_nonpay = any(kw in all_text for kw in NONPAY_SUBJECT_KEYWORDS)
+        # The body already matched, so it is a non-pay notice
+        is_nonpay = True
+    else:
+        # Check for non-pay keywords in subject OR body — each source probed
+        # separately, with no concatenated copy of the (large) bodies
+        is_nonpay = _contains_any(NONPAY_SUBJECT_KEYWORDS, subject_lower, html_lower, (plain_body or "").lower())
     if not is_nonpay:
         logger.info("Inbound email skipped (no non-pay keyword in subject or body): %s", subject[:80])
         return {"status": "skipped", "reason": "No non-pay keywords found in subject or body"}
 
     # Detect carrier from sender, forwarded-from headers, or body content
     sender_lower = sender.lower()
-    carrier = ""
 
     # Check the actual sender and also the forwarded message headers in the body
-    carrier_checks = f"{sender_lower} {html_lower}"
-    if "grange" in carrier_checks:
-        carrier = "grange"
-    elif "travelers" in carrier_checks:
-        carrier = "travelers"
-    elif "progressive" in carrier_checks:
-        carrier = "progressive"
-    elif "safeco" in carrier_checks:
-        carrier = "safeco"
-    elif "national" in carrier_checks and "general" in carrier_checks:
-        carrier = "national_general"
+    carrier = _carrier_from_text((sender_lower, html_lower), _INBOUND_CARRIER_RULES)
 
     # Parse the HTML body for policy data
     if not html_body:
@@ -1773,7 +2478,7 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
     if "grange" in carrier:
         policies = _parse_grangewire_html(html_body)
     else:
-        policies = _parse_generic_email_html(html_body, carrier)
+        policies = _parse_generic_email_html(html_body, carrier, body_lower=html_lower)
 
     if not policies:
         logger.warning("Inbound email: no policies extracted from body")
@@ -1792,8 +2497,16 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
         status="processing",
     )
     db.add(notice)
+    db.flush()
+    # Bind the id now: every per-policy commit below expires the instance, and
+    # reading notice.id afterwards would cost a refresh SELECT each time
+    notice_id = notice.id
     db.commit()
-    db.refresh(notice)
+
+    # Look up every exact policy number in one query instead of per policy
+    prefetched = _prefetch_policies(
+        db, ((pol.get("policy_number") or "").strip() for pol in policies)
+    )
 
     # Process each policy (same logic as file upload)
     results = []
@@ -1811,24 +2524,15 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
         cancel_reason = pol.get("cancel_reason", "")
 
         reason_lower = cancel_reason.lower() if cancel_reason else ""
-        is_nonpay = any(kw in reason_lower for kw in [
-            "non payment", "non-payment", "nonpayment", "non pay", "non-pay",
-            "nsf", "insufficient fund", "past due", "past-due",
-        ])
-        is_nonrenewal = any(kw in reason_lower for kw in [
-            "non-renewal", "nonrenewal",
-        ])
-        is_skip = any(kw in reason_lower for kw in [
-            "underwriting", "policyholder request", "insured request",
-            "company cancel",
-        ])
+        is_nonpay = _contains_any(_REASON_NONPAY_KEYWORDS, reason_lower)
+        is_nonrenewal = _contains_any(_REASON_NONRENEWAL_KEYWORDS, reason_lower)
+        is_skip = _contains_any(_REASON_SKIP_KEYWORDS, reason_lower)
 
         # Non-renewals → create reshop instead of skipping
         if is_nonrenewal:
             try:
                 from app.models.reshop import Reshop
                 from app.api.reshop import _get_next_round_robin_agent, ACTIVE_STAGES
-                from app.models.customer import Customer
 
                 existing_reshop = db.query(Reshop).filter(
                     Reshop.policy_number == pnum,
@@ -1842,11 +2546,9 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
                     if not any(kw in lob for kw in COMMERCIAL_KW):
                         customer = None
                         current_premium = None
-                        cp = db.query(CustomerPolicy).filter(
-                            CustomerPolicy.policy_number == pnum
-                        ).first()
+                        cp = prefetched.get(pnum)
                         if cp:
-                            customer = db.query(Customer).filter(Customer.id == cp.customer_id).first()
+                            customer = cp.customer
                             current_premium = cp.premium
 
                         insured = pol.get("insured_name") or (customer.full_name if customer else "Unknown")
@@ -1898,7 +2600,7 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
 
         result = _process_single_policy(
             db=db,
-            notice_id=notice.id,
+            notice_id=notice_id,
             policy_number=pnum,
             carrier=pol.get("carrier", carrier),
             insured_name=pol.get("insured_name", ""),
@@ -1906,6 +2608,7 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
             due_date=pol.get("due_date"),
             cancel_date=pol.get("cancel_date"),
             dry_run=dry_run,
+            prefetched=prefetched,
         )
         result["cancel_reason"] = cancel_reason
         result["notice_type"] = notice_type
@@ -1928,7 +2631,7 @@ async def inbound_email_webhook(request: Request, db: Session = Depends(get_db))
     summary = {
         "status": "processed",
         "mode": "dry_run" if dry_run else "live",
-        "notice_id": notice.id,
+        "notice_id": notice_id,
         "carrier": carrier,
         "subject": subject[:100],
         "policies_found": len(policies),
@@ -1960,7 +2663,7 @@ def nonpay_history(
         .limit(limit)
         .all()
     )
-    return {
+    return ORJSONResponse({
         "notices": [{
             "id": n.id,
             "filename": n.filename,
@@ -1972,9 +2675,9 @@ def nonpay_history(
             "emails_skipped": n.emails_skipped,
             "status": n.status,
             "error_message": n.error_message,
-            "created_at": n.created_at.isoformat() if n.created_at else None,
+            "created_at": n.created_at,
         } for n in notices]
-    }
+    })
 
 
 @router.get("/emails")
@@ -1990,7 +2693,7 @@ def nonpay_emails(
         query = query.filter(NonPayEmail.policy_number == policy_number)
     emails = query.limit(limit).all()
 
-    return {
+    return ORJSONResponse({
         "emails": [{
             "id": e.id,
             "policy_number": e.policy_number,
@@ -2000,9 +2703,9 @@ def nonpay_emails(
             "amount_due": float(e.amount_due) if e.amount_due else None,
             "due_date": e.due_date,
             "email_status": e.email_status,
-            "sent_at": e.sent_at.isoformat() if e.sent_at else None,
+            "sent_at": e.sent_at,
         } for e in emails]
-    }
+    })
 
 
 @router.get("/preview")
@@ -2026,22 +2729,37 @@ def preview_nonpay_email(
     return {"subject": subject, "html": html, "carrier": carrier}
 
 
+# Built on first /carriers request — CARRIER_INFO is static for the process
+_CARRIERS_BODY: Optional[bytes] = None
+_CARRIERS_ETAG: str = ""
+
+
 @router.get("/carriers")
 def list_nonpay_carriers(
+    request: Request,
     current_user: User = Depends(get_current_user),
 ):
     """List all carriers that have custom email templates."""
-    from app.services.welcome_email import CARRIER_INFO
-    carriers = []
-    for key, info in CARRIER_INFO.items():
-        carriers.append({
-            "key": key,
-            "display_name": info.get("display_name", key),
-            "accent_color": info.get("accent_color", "#1a2b5f"),
-            "has_payment_url": bool(info.get("payment_url")),
-        })
-    carriers.sort(key=lambda c: c["display_name"])
-    return {"carriers": carriers}
+    global _CARRIERS_BODY, _CARRIERS_ETAG
+    if _CARRIERS_BODY is None:
+        from app.services.welcome_email import CARRIER_INFO
+        carriers = []
+        for key, info in CARRIER_INFO.items():
+            carriers.append({
+                "key": key,
+                "display_name": info.get("display_name", key),
+                "accent_color": info.get("accent_color", "#1a2b5f"),
+                "has_payment_url": bool(info.get("payment_url")),
+            })
+        carriers.sort(key=lambda c: c["display_name"])
+        _CARRIERS_BODY = orjson.dumps({"carriers": carriers})
+        _CARRIERS_ETAG = '"%s"' % hashlib.md5(_CARRIERS_BODY).hexdigest()
+
+    # Authenticated response: cacheable by the browser only, not shared caches
+    headers = {"ETag": _CARRIERS_ETAG, "Cache-Control": "private, max-age=3600"}
+    if request.headers.get("if-none-match") == _CARRIERS_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(content=_CARRIERS_BODY, media_type="application/json", headers=headers)
 
 
 @router.post("/send-test")
@@ -2602,52 +3320,13 @@ def _parse_grange_nonrenewal_table(html_body: str) -> list[dict]:
     Format: Policy Symbol | Number | Insured
     Policy number = Symbol + Number combined (e.g., "PHA" + "5168274 02")
     """
-    from html.parser import HTMLParser
-
-    class TableParser(HTMLParser):
-        def __init__(self):
-            super().__init__()
-            self.in_table = False
-            self.in_row = False
-            self.in_cell = False
-            self.current_row = []
-            self.current_cell = ""
-            self.rows = []
-
-        def handle_starttag(self, tag, attrs):
-            if tag == "table":
-                self.in_table = True
-            elif tag == "tr" and self.in_table:
-                self.in_row = True
-                self.current_row = []
-            elif tag in ("td", "th") and self.in_row:
-                self.in_cell = True
-                self.current_cell = ""
-
-        def handle_endtag(self, tag):
-            if tag == "table":
-                self.in_table = False
-            elif tag == "tr" and self.in_row:
-                self.in_row = False
-                if self.current_row:
-                    self.rows.append(self.current_row)
-            elif tag in ("td", "th") and self.in_cell:
-                self.in_cell = False
-                self.current_row.append(self.current_cell.strip())
-
-        def handle_data(self, data):
-            if self.in_cell:
-                self.current_cell += data
-
-    parser = TableParser()
-    parser.feed(html_body or "")
-
-    if not parser.rows:
+    rows = _html_table_rows(html_body)
+    if not rows:
         return []
 
     # Find header row — look for "Symbol" or "Number" or "Insured"
     header_idx = None
-    for i, row in enumerate(parser.rows):
+    for i, row in enumerate(rows):
         row_upper = " ".join(row).upper()
         if "SYMBOL" in row_upper or ("NUMBER" in row_upper and "INSURED" in row_upper):
             header_idx = i
@@ -2659,7 +3338,7 @@ def _parse_grange_nonrenewal_table(html_body: str) -> list[dict]:
 
     if header_idx is None:
         # Fallback: if we have 3-column rows, assume first is header
-        for i, row in enumerate(parser.rows):
+        for i, row in enumerate(rows):
             if len(row) == 3:
                 header_idx = i
                 break
@@ -2667,7 +3346,7 @@ def _parse_grange_nonrenewal_table(html_body: str) -> list[dict]:
     if header_idx is None:
         return []
 
-    headers = [h.upper().strip() for h in parser.rows[header_idx]]
+    headers = [h.upper().strip() for h in rows[header_idx]]
 
     # Map columns
     symbol_idx = 0
@@ -2683,7 +3362,7 @@ def _parse_grange_nonrenewal_table(html_body: str) -> list[dict]:
             insured_idx = i
 
     results = []
-    for row in parser.rows[header_idx + 1:]:
+    for row in rows[header_idx + 1:]:
         if len(row) < 3:
             continue
 
@@ -3093,8 +3772,10 @@ async def _handle_natgen_policy_activity(html_body: str, sender: str, db: Sessio
             results["compliance_reminders"] = {"error": str(e)}
 
     # Log full dry-run results for review
-    import json
-    logger.info("=== NATGEN HANDLER RESULTS ===\n%s", json.dumps(results, indent=2, default=str))
+    logger.info(
+        "=== NATGEN HANDLER RESULTS ===\n%s",
+        orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str).decode(),
+    )
 
     return results
 
@@ -3519,9 +4200,8 @@ def customer_lookup(policy_number: str, db: Session = Depends(get_db)):
 @router.post("/push-note")
 async def push_note_only(request: Request, db: Session = Depends(get_db)):
     """Push a NowCerts note without sending an email. Body: {client_name, email, policy_number, carrier, note_type, requirement_type, due_date}"""
-    import json
     raw = await request.body()
-    body = json.loads(raw.decode()) if raw else {}
+    body = orjson.loads(raw) if raw else {}
     
     note_type = body.get("note_type", "uw")
     
@@ -1,38 +1,101 @@
 """Payroll API — submit, lock, view history, and mark paid."""
 import logging
-from datetime import datetime
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func as sqlfunc
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, undefer
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import Float, func as sqlfunc, delete, insert, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from pydantic import BaseModel
 
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.database import get_async_db, get_db
+from app.core.security import require_roles
 from app.models.user import User
 from app.models.sale import Sale
-from app.models.payroll import PayrollRecord, PayrollAgentLine
-from app.services.reconciliation import ReconciliationService
+from app.models.payroll import PayrollRecord, PayrollAgentLine, PayrollIdempotencyKey
+from app.services.reconciliation import ReconciliationService, invalidate_monthly_pay_cache
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/payroll", tags=["payroll"])
+router = APIRouter(prefix="/api/payroll", tags=["payroll"], default_response_class=ORJSONResponse)
+
+
+def _save_payroll(db: Session):
+    """Commit, turning a PayrollRecord version conflict into a 409."""
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Payroll record was modified concurrently; reload and retry",
+        )
+
+
+# "2026-01" style payroll periods; month names for the "January 2026" display
+_PERIOD_RE = re.compile(r"(\d{4})-(0[1-9]|1[0-2])")
+_MONTH_NAMES = (None,) + tuple(datetime(2000, m, 1).strftime("%B") for m in range(1, 13))
+
+# Submit responses are replayed for a repeated Idempotency-Key within this window
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+
+def _replay_submit(db: Session, key: str, period: str) -> Optional[dict]:
+    """Stored response for an unexpired Idempotency-Key, or None."""
+    stored = db.execute(
+        select(PayrollIdempotencyKey.period, PayrollIdempotencyKey.response).where(
+            PayrollIdempotencyKey.key == key,
+            PayrollIdempotencyKey.created_at > sqlfunc.now() - IDEMPOTENCY_TTL,
+        )
+    ).first()
+    if stored is None:
+        return None
+    if stored.period != period:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different period")
+    return stored.response
+
+
+def _remember_submit(db: Session, key: str, period: str, response: dict):
+    """Record the response for `key` (same transaction as the submit) and prune expired keys."""
+    db.execute(
+        delete(PayrollIdempotencyKey)
+        .where(PayrollIdempotencyKey.created_at <= sqlfunc.now() - IDEMPOTENCY_TTL)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        pg_insert(PayrollIdempotencyKey)
+        .values(key=key, period=period, response=response)
+        .on_conflict_do_nothing(index_elements=[PayrollIdempotencyKey.key])
+    )
 
 
 @router.post("/submit/{period}")
 def submit_payroll(
     period: str,
     body: dict = None,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_roles("admin", "manager")),
     db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
-    """Submit/finalize payroll for a month. Snapshots current monthly pay data with overrides."""
-    if current_user.role.lower() not in ("admin", "manager"):
-        raise HTTPException(status_code=403, detail="Admin access required")
+    """Submit/finalize payroll for a month. Snapshots current monthly pay data with overrides.
 
-    # Check if already submitted
-    existing = db.query(PayrollRecord).filter(PayrollRecord.period == period).first()
-    if existing and existing.is_locked:
-        raise HTTPException(status_code=400, detail=f"Payroll for {period} is already locked. Use unlock first.")
+    With an Idempotency-Key header, a retried submit returns the original
+    response instead of recalculating (keys are kept for 24h).
+    """
+    # Reject malformed periods before any DB work
+    match = _PERIOD_RE.fullmatch(period)
+    if not match:
+        raise HTTPException(status_code=400, detail=f"Invalid period {period!r}; expected YYYY-MM")
+    period_display = f"{_MONTH_NAMES[int(match[2])]} {match[1]}"
+
+    if idempotency_key:
+        replay = _replay_submit(db, idempotency_key, period)
+        if replay is not None:
+            return replay
 
     # Parse agent overrides: { "agent_id": { "rate_adjustment": 0.005, "bonus": 100 } }
     agent_overrides = (body or {}).get("agent_overrides", {})
@@ -44,62 +107,73 @@ def submit_payroll(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    year, month = map(int, period.split("-"))
-    period_display = datetime(year, month, 1).strftime("%B %Y")
-
-    # Delete existing draft if any
-    if existing:
-        db.query(PayrollAgentLine).filter(PayrollAgentLine.payroll_record_id == existing.id).delete()
-        db.delete(existing)
-        db.flush()
-
     # Apply overrides to agent summaries for the snapshot
-    total_agent_pay = 0
-    for agent in pay_data.get("agent_summaries", []):
-        aid = str(agent["agent_id"])
-        overrides = agent_overrides.get(aid, {})
-        rate_adj = float(overrides.get("rate_adjustment", 0))
-        bonus = float(overrides.get("bonus", 0))
+    # Coerce overrides once: agent_id -> (rate_adjustment, bonus)
+    overrides_map = {
+        str(k): (float(v.get("rate_adjustment", 0) or 0), float(v.get("bonus", 0) or 0))
+        for k, v in agent_overrides.items()
+    }
+    no_override = (0.0, 0.0)
+    agent_summaries = pay_data.get("agent_summaries", [])
+    for agent in agent_summaries:
+        rate_adj, bonus = overrides_map.get(str(agent["agent_id"]), no_override)
         agent["rate_adjustment"] = rate_adj
         agent["bonus"] = bonus
 
-        if rate_adj != 0:
-            base_comm = agent.get("net_agent_commission", agent.get("total_agent_commission", 0))
-            base_rate = agent.get("commission_rate", 0)
-            if base_rate:
-                commissionable_premium = base_comm / base_rate
-                adjusted_comm = commissionable_premium * (base_rate + rate_adj)
-                agent["adjusted_commission"] = round(adjusted_comm, 2)
-            else:
-                agent["adjusted_commission"] = base_comm
-        else:
-            agent["adjusted_commission"] = agent.get("net_agent_commission", agent.get("total_agent_commission", 0))
-
+        base_comm = agent.get("net_agent_commission", agent.get("total_agent_commission", 0))
+        base_rate = agent.get("commission_rate", 0)
+        agent["adjusted_commission"] = (
+            round(base_comm / base_rate * (base_rate + rate_adj), 2)
+            if rate_adj and base_rate
+            else base_comm
+        )
         agent["grand_total"] = round(agent["adjusted_commission"] + bonus, 2)
-        total_agent_pay += agent["grand_total"]
 
-    # Create payroll record
-    record = PayrollRecord(
+    # Create or replace the payroll record in one atomic upsert. A locked
+    # period fails the DO UPDATE guard, so RETURNING comes back empty.
+    totals = pay_data.get("totals", {})
+    row = dict(
         period=period,
         period_display=period_display,
         status="submitted",
         submitted_at=datetime.utcnow(),
         submitted_by_id=current_user.id,
+        paid_at=None,
         is_locked=True,
-        total_agents=len(pay_data.get("agent_summaries", [])),
-        total_premium=pay_data.get("totals", {}).get("total_premium", 0),
-        total_agent_pay=total_agent_pay,
-        total_chargebacks=pay_data.get("totals", {}).get("total_chargebacks", 0),
-        total_carriers=pay_data.get("totals", {}).get("total_carriers", 0),
+        total_agents=0,  # agent totals are aggregated from the stored lines below
+        total_premium=totals.get("total_premium", 0),
+        total_agent_pay=0,
+        total_chargebacks=totals.get("total_chargebacks", 0),
+        total_carriers=totals.get("total_carriers", 0),
         snapshot_data=pay_data,
     )
-    db.add(record)
-    db.flush()
+    stmt = pg_insert(PayrollRecord).values(**row)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PayrollRecord.period],
+        set_={
+            **{k: stmt.excluded[k] for k in row if k != "period"},
+            "version_id": PayrollRecord.version_id + 1,
+            "updated_at": sqlfunc.now(),
+        },
+        where=PayrollRecord.is_locked.isnot(True),
+    ).returning(PayrollRecord.id)
+    record_id = db.execute(stmt).scalar()
+    if record_id is None:
+        db.rollback()
+        # A concurrent retry with the same key may have just locked it
+        replay = _replay_submit(db, idempotency_key, period) if idempotency_key else None
+        if replay is not None:
+            return replay
+        raise HTTPException(status_code=400, detail=f"Payroll for {period} is already locked. Use unlock first.")
+
+    # Replace any lines left over from a previous draft of this period
+    db.execute(delete(PayrollAgentLine).where(PayrollAgentLine.payroll_record_id == record_id))
 
-    # Create per-agent lines
-    for agent in pay_data.get("agent_summaries", []):
-        line = PayrollAgentLine(
-            payroll_record_id=record.id,
+    # Create per-agent lines — one executemany INSERT, no per-line ORM objects
+    line_rows = []
+    for agent in agent_summaries:
+        line_rows.append(dict(
+            payroll_record_id=record_id,
             agent_id=agent["agent_id"],
             agent_name=agent["agent_name"],
             agent_role=agent.get("agent_role", "producer"),
@@ -118,34 +192,54 @@ def submit_payroll(
             bonus=agent.get("bonus", 0),
             grand_total=agent.get("grand_total", agent.get("total_agent_commission", 0)),
             commission_status="pending",
-        )
-        db.add(line)
+        ))
+    # executemany INSERT ... RETURNING (batched via insertmanyvalues): the
+    # stored line ids and Numeric(12,2) grand totals come back in the same trip
+    stored_lines = []
+    if line_rows:
+        stored_lines = db.execute(
+            insert(PayrollAgentLine).returning(PayrollAgentLine.id, PayrollAgentLine.grand_total),
+            line_rows,
+        ).all()
+
+    # Agent totals from the stored Numeric values (exact Decimal sum, no
+    # float accumulation), written back with one UPDATE
+    total_agents = len(stored_lines)
+    total_agent_pay = sum((l.grand_total or Decimal("0") for l in stored_lines), Decimal("0"))
+    db.execute(
+        update(PayrollRecord)
+        .where(PayrollRecord.id == record_id)
+        .values(total_agent_pay=total_agent_pay, total_agents=total_agents)
+        .execution_options(synchronize_session=False)
+    )
 
     # Mark matched sales as commission pending for this period
     _update_sales_commission_status(db, pay_data, period, "pending")
 
-    db.commit()
-
-    return {
+    response = {
         "success": True,
-        "payroll_id": record.id,
+        "payroll_id": record_id,
         "period": period,
         "period_display": period_display,
         "status": "submitted",
-        "total_agents": record.total_agents,
-        "total_agent_pay": float(record.total_agent_pay or 0),
+        "total_agents": total_agents,
+        "total_agent_pay": float(total_agent_pay or 0),
     }
+    if idempotency_key:
+        _remember_submit(db, idempotency_key, period, response)
+
+    _save_payroll(db)
+
+    return response
 
 
 @router.post("/unlock/{period}")
 def unlock_payroll(
     period: str,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_roles("admin", detail="Admin access required to unlock payroll")),
     db: Session = Depends(get_db),
 ):
     """Admin override: unlock a submitted payroll for re-calculation."""
-    if current_user.role.lower() != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required to unlock payroll")
 
     record = db.query(PayrollRecord).filter(PayrollRecord.period == period).first()
     if not record:
@@ -153,7 +247,9 @@ def unlock_payroll(
 
     record.is_locked = False
     record.status = "draft"
-    db.commit()
+    _save_payroll(db)
+    # Unlocking is the "recalculate" step — never serve a memoized result for it
+    invalidate_monthly_pay_cache(period)
 
     return {"success": True, "period": period, "status": "draft", "is_locked": False}
 
@@ -161,14 +257,17 @@ def unlock_payroll(
 @router.post("/mark-paid/{period}")
 def mark_payroll_paid(
     period: str,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_roles("admin", "manager")),
     db: Session = Depends(get_db),
 ):
     """Mark entire payroll as paid — updates all agent lines and related sales."""
-    if current_user.role.lower() not in ("admin", "manager"):
-        raise HTTPException(status_code=403, detail="Admin access required")
 
-    record = db.query(PayrollRecord).filter(PayrollRecord.period == period).first()
+    record = (
+        db.query(PayrollRecord)
+        .options(undefer(PayrollRecord.snapshot_data))
+        .filter(PayrollRecord.period == period)
+        .first()
+    )
     if not record:
         raise HTTPException(status_code=404, detail="No payroll record found for this period")
 
@@ -176,37 +275,54 @@ def mark_payroll_paid(
     record.status = "paid"
     record.paid_at = now
 
-    # Mark all agent lines as paid
-    lines = db.query(PayrollAgentLine).filter(PayrollAgentLine.payroll_record_id == record.id).all()
-    for line in lines:
-        line.commission_status = "paid"
-        line.paid_at = now
+    # Mark all agent lines as paid (single UPDATE, nothing loaded)
+    agents_paid = db.execute(
+        update(PayrollAgentLine)
+        .where(PayrollAgentLine.payroll_record_id == record.id)
+        .values(commission_status="paid", paid_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
 
     # Mark matching sales as commission paid
+    sales_paid = []
     if record.snapshot_data:
-        _update_sales_commission_status(db, record.snapshot_data, period, "paid")
+        sales_paid = _update_sales_commission_status(db, record.snapshot_data, period, "paid")
 
-    db.commit()
+    _save_payroll(db)
 
-    return {"success": True, "period": period, "status": "paid", "agents_paid": len(lines)}
+    return {"success": True, "period": period, "status": "paid", "agents_paid": agents_paid, "sales_paid": len(sales_paid)}
 
 
 @router.get("/history")
-def get_payroll_history(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def get_payroll_history(
+    current_user: User = Depends(require_roles("admin", "manager")),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get all historical payroll records."""
-    if current_user.role.lower() not in ("admin", "manager"):
-        raise HTTPException(status_code=403, detail="Admin access required")
 
-    records = (
-        db.query(PayrollRecord)
+    # Column projection: skips hydrating entities and the (large) snapshot_data JSON
+    stmt = (
+        select(
+            PayrollRecord.id,
+            PayrollRecord.period,
+            PayrollRecord.period_display,
+            PayrollRecord.status,
+            PayrollRecord.is_locked,
+            PayrollRecord.submitted_at,
+            PayrollRecord.paid_at,
+            PayrollRecord.total_agents,
+            PayrollRecord.total_premium,
+            PayrollRecord.total_agent_pay,
+            PayrollRecord.total_chargebacks,
+            PayrollRecord.total_carriers,
+        )
         .order_by(PayrollRecord.period.desc())
-        .all()
+        .execution_options(yield_per=500)
     )
 
-    return [
+    # Streamed in batches from a server-side cursor; ORJSONResponse skips jsonable_encoder
+    rows = await db.stream(stmt)
+    return ORJSONResponse([
         {
             "id": r.id,
             "period": r.period,
@@ -221,101 +337,111 @@ def get_payroll_history(
             "total_chargebacks": float(r.total_chargebacks or 0),
             "total_carriers": r.total_carriers,
         }
-        for r in records
-    ]
+        async for r in rows
+    ])
+
+
+def _as_float(col):
+    """coalesce(col, 0)::float, labelled with the column's own name."""
+    return sqlfunc.coalesce(col, 0).cast(Float).label(col.key)
 
 
 @router.get("/detail/{period}")
-def get_payroll_detail(
+async def get_payroll_detail(
     period: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles("admin", "manager")),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get detailed payroll record with agent lines."""
-    if current_user.role.lower() not in ("admin", "manager"):
-        raise HTTPException(status_code=403, detail="Admin access required")
 
-    record = db.query(PayrollRecord).filter(PayrollRecord.period == period).first()
+    record = (
+        await db.execute(select(PayrollRecord).where(PayrollRecord.period == period))
+    ).scalar_one_or_none()
     if not record:
         raise HTTPException(status_code=404, detail="No payroll record found for this period")
 
-    lines = (
-        db.query(PayrollAgentLine)
-        .filter(PayrollAgentLine.payroll_record_id == record.id)
-        .order_by(PayrollAgentLine.net_agent_pay.desc())
-        .all()
-    )
+    # Lines as plain Core rows: numerics come back as floats and nulls as
+    # defaults straight from Postgres, so orjson serializes the mappings as-is
+    L = PayrollAgentLine
+    lines = (await db.execute(
+        select(
+            L.id,
+            L.agent_id,
+            L.agent_name,
+            L.agent_role,
+            L.tier_level,
+            _as_float(L.commission_rate),
+            _as_float(L.total_premium),
+            _as_float(L.new_business_premium),
+            _as_float(L.total_agent_commission),
+            _as_float(L.chargebacks),
+            _as_float(L.chargeback_premium),
+            L.chargeback_count,
+            _as_float(L.net_agent_pay),
+            L.line_count,
+            sqlfunc.coalesce(L.carrier_breakdown, literal_column("'[]'::json")).label("carrier_breakdown"),
+            _as_float(L.rate_adjustment),
+            _as_float(L.bonus),
+            _as_float(L.grand_total),
+            L.commission_status,
+            L.paid_at,
+        )
+        .where(L.payroll_record_id == record.id)
+        .order_by(L.net_agent_pay.desc())
+    )).mappings()
 
-    return {
+    return ORJSONResponse({
         "id": record.id,
         "period": record.period,
         "period_display": record.period_display,
         "status": record.status,
         "is_locked": record.is_locked,
-        "submitted_at": record.submitted_at.isoformat() if record.submitted_at else None,
-        "paid_at": record.paid_at.isoformat() if record.paid_at else None,
+        "submitted_at": record.submitted_at,
+        "paid_at": record.paid_at,
         "total_agents": record.total_agents,
         "total_premium": float(record.total_premium or 0),
         "total_agent_pay": float(record.total_agent_pay or 0),
         "total_chargebacks": float(record.total_chargebacks or 0),
         "total_carriers": record.total_carriers,
         "notes": record.notes,
-        "agent_lines": [
-            {
-                "id": l.id,
-                "agent_id": l.agent_id,
-                "agent_name": l.agent_name,
-                "agent_role": l.agent_role,
-                "tier_level": l.tier_level,
-                "commission_rate": float(l.commission_rate or 0),
-                "total_premium": float(l.total_premium or 0),
-                "new_business_premium": float(l.new_business_premium or 0),
-                "total_agent_commission": float(l.total_agent_commission or 0),
-                "chargebacks": float(l.chargebacks or 0),
-                "chargeback_premium": float(l.chargeback_premium or 0),
-                "chargeback_count": l.chargeback_count,
-                "net_agent_pay": float(l.net_agent_pay or 0),
-                "line_count": l.line_count,
-                "carrier_breakdown": l.carrier_breakdown or [],
-                "rate_adjustment": float(l.rate_adjustment or 0),
-                "bonus": float(l.bonus or 0),
-                "grand_total": float(l.grand_total or 0),
-                "commission_status": l.commission_status,
-                "paid_at": l.paid_at.isoformat() if l.paid_at else None,
-            }
-            for l in lines
-        ],
-    }
+        "agent_lines": [dict(row) for row in lines],
+    })
 
 
-def _update_sales_commission_status(db: Session, pay_data: dict, period: str, status: str):
-    """Update commission_status on sales that are part of this payroll."""
-    from app.models.statement import StatementImport, StatementLine
+def _update_sales_commission_status(db: Session, pay_data: dict, period: str, status: str) -> List[int]:
+    """Update commission_status on sales that are part of this payroll.
 
-    # Get all imports for this period
-    imports = db.query(StatementImport).filter(StatementImport.statement_period == period).all()
-    if not imports:
-        return
-
-    import_ids = [imp.id for imp in imports]
-
-    # Get all matched lines with sales
-    lines = db.query(StatementLine).filter(
-        StatementLine.statement_import_id.in_(import_ids),
-        StatementLine.matched_sale_id.isnot(None),
-        StatementLine.is_matched == True,
-    ).all()
+    Returns the ids of the sales that were updated.
+    """
+    from app.models.statement import StatementImport, StatementLine
 
-    sale_ids = list(set(l.matched_sale_id for l in lines if l.matched_sale_id))
-    if not sale_ids:
-        return
+    # Sales matched on any statement imported for this period, deduplicated
+    # in a CTE and updated in the same statement (one round trip)
+    affected = (
+        select(StatementLine.matched_sale_id.label("sale_id"))
+        .distinct()
+        .join(StatementImport, StatementLine.statement_import_id == StatementImport.id)
+        .where(
+            StatementImport.statement_period == period,
+            StatementLine.is_matched.is_(True),
+            StatementLine.matched_sale_id.isnot(None),
+        )
+        .cte("affected_sales")
+    )
 
-    now = datetime.utcnow()
-    for sale in db.query(Sale).filter(Sale.id.in_(sale_ids)).all():
-        sale.commission_status = status
-        if status == "paid":
-            sale.commission_paid_date = now
-            sale.commission_paid_period = period
+    values = {"commission_status": status}
+    if status == "paid":
+        values["commission_paid_date"] = datetime.utcnow()
+        values["commission_paid_period"] = period
+    sale_ids = db.execute(
+        update(Sale)
+        .where(Sale.id == affected.c.sale_id)
+        .values(**values)
+        .returning(Sale.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    logger.info(f"Payroll {period}: marked {len(sale_ids)} sales commission {status}")
+    return sale_ids
 
 
 # ─── Commission Sheet Email Distribution ────────────────────────────
@@ -327,7 +453,7 @@ def _update_sales_commission_status(db: Session, pay_data: dict, period: str, st
 @router.get("/{period}/commission-sheets/preview")
 def preview_commission_sheet_recipients(
     period: str,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_roles("admin", detail="Admin only")),
     db: Session = Depends(get_db),
 ):
     """Return the list of producers who would receive a commission sheet email
@@ -341,22 +467,20 @@ def preview_commission_sheet_recipients(
       - has_already_sent flag if a prior send happened for this period
       - net_pay so admin can verify the right number is going out
     """
-    if current_user.role.lower() not in ("admin",):
-        raise HTTPException(status_code=403, detail="Admin only")
-
     record = db.query(PayrollRecord).filter(PayrollRecord.period == period).first()
     if not record:
         raise HTTPException(status_code=404, detail=f"No payroll record for {period}")
     if not record.is_locked:
         raise HTTPException(status_code=400, detail="Payroll must be locked before sending commission sheets")
 
-    lines = db.query(PayrollAgentLine).filter(
+    # Agents ride along in one extra IN query instead of one lookup per line
+    lines = db.query(PayrollAgentLine).options(selectinload(PayrollAgentLine.agent)).filter(
         PayrollAgentLine.payroll_record_id == record.id
     ).all()
 
     recipients = []
     for line in lines:
-        user = db.query(User).filter(User.id == line.agent_id).first()
+        user = line.agent
         recipients.append({
             "agent_id": line.agent_id,
             "agent_name": line.agent_name,
@@ -392,7 +516,7 @@ class SendCommissionSheetsBody(BaseModel):
 def send_commission_sheets(
     period: str,
     body: SendCommissionSheetsBody,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_roles("admin", detail="Admin only")),
     db: Session = Depends(get_db),
 ):
     """Email each producer their commission sheet PDF for this period.
@@ -410,9 +534,6 @@ def send_commission_sheets(
         commission_sheet_sent_to are set on success
       - Logs each send for audit trail
     """
-    if current_user.role.lower() not in ("admin",):
-        raise HTTPException(status_code=403, detail="Admin only")
-
     if not body.confirm:
         raise HTTPException(
             status_code=400,
@@ -425,7 +546,7 @@ def send_commission_sheets(
     if not record.is_locked:
         raise HTTPException(status_code=400, detail="Payroll must be locked first")
 
-    lines = db.query(PayrollAgentLine).filter(
+    lines = db.query(PayrollAgentLine).options(selectinload(PayrollAgentLine.agent)).filter(
         PayrollAgentLine.payroll_record_id == record.id
     ).all()
 
@@ -462,7 +583,7 @@ def send_commission_sheets(
             })
             continue
 
-        user = db.query(User).filter(User.id == agent_id).first()
+        user = line.agent
         target_email = body.test_mode_recipient or (user.email if user else None)
 
         if not target_email:
@@ -12,14 +12,19 @@ Features:
 import json
 import logging
 import os
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, List
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
-from fastapi.responses import HTMLResponse
+import aiofiles
+import httpx
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, func, or_, select, update
 from pydantic import BaseModel
 from app.core.config import settings
 from app.core.database import get_db
@@ -28,7 +33,7 @@ from app.models.user import User
 from app.models.campaign import Quote
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/quotes", tags=["Quotes"])
+router = APIRouter(prefix="/api/quotes", tags=["Quotes"], default_response_class=ORJSONResponse)
 
 
 # ── Schemas ──
@@ -75,8 +80,37 @@ class QuoteUpdate(BaseModel):
     followup_disabled: Optional[bool] = None
 
 
+# Quotes the follow-up scheduler (and its diagnostic view) scans
+_FOLLOWUP_SCAN = (
+    Quote.status.in_(("sent", "following_up", "bind_requested", "remarket")),
+    Quote.email_sent,
+    Quote.email_sent_at.isnot(None),
+)
+
+
+# ── Helper: Stream an upload to disk ──
+
+_UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+async def _save_upload(file: UploadFile, file_path: Path) -> int:
+    """Copy an upload to disk a chunk at a time; returns the byte count."""
+    size = 0
+    async with aiofiles.open(file_path, "wb") as out:
+        while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+            await out.write(chunk)
+            size += len(chunk)
+    return size
+
+
 # ── Helper: Create NowCerts prospect (or merge into existing) ──
 
+# NowCerts sync runs here so it overlaps other outbound calls. The quote
+# passed in is fully loaded and only read, so no session work happens off
+# the request thread.
+_crm_executor = ThreadPoolExecutor(max_workers=4)
+
+
 def _create_nowcerts_prospect(quote: Quote):
     """Create a prospect in NowCerts, or add note to existing customer/prospect."""
     try:
@@ -89,13 +123,20 @@ def _create_nowcerts_prospect(quote: Quote):
         first = parts[0] if parts else ""
         last = parts[-1] if len(parts) > 1 else parts[0] if parts else ""
 
-        # Search NowCerts for existing customer/prospect
+        # Search NowCerts for existing customer/prospect. The searches run
+        # concurrently; matches are still taken in priority order below.
+        search_queries = [quote.prospect_email, f"{first} {last}", last]
+        try:
+            results_by_query = nc.search_insureds_many(search_queries, limit=5)
+        except Exception as e:
+            logger.warning("NowCerts search failed for %s: %s", quote.prospect_name, e)
+            results_by_query = {}
         existing = None
-        for search_query in [quote.prospect_email, f"{first} {last}", last]:
+        for search_query in search_queries:
             if not search_query:
                 continue
             try:
-                results = nc.search_insureds(search_query, limit=5)
+                results = results_by_query.get(search_query)
                 if results:
                     # Match by email first
                     if quote.prospect_email:
@@ -172,11 +213,30 @@ def _create_nowcerts_prospect(quote: Quote):
 
 # ── Helper: Convert quote to dict ──
 
-def _quote_to_dict(q: Quote) -> dict:
+# Columns _quote_to_dict reads, for read paths that don't need a full entity
+_QUOTE_DICT_COLUMNS = (
+    Quote.id, Quote.prospect_name, Quote.prospect_email, Quote.prospect_phone,
+    Quote.prospect_address, Quote.prospect_city, Quote.prospect_state, Quote.prospect_zip,
+    Quote.carrier, Quote.policy_type, Quote.quoted_premium, Quote.effective_date,
+    Quote.premium_term, Quote.notes, Quote.policy_lines, Quote.status,
+    Quote.quote_pdf_path, Quote.quote_pdf_paths, Quote.quote_pdf_filename,
+    Quote.email_sent, Quote.email_sent_at, Quote.followup_3day_sent,
+    Quote.followup_7day_sent, Quote.followup_14day_sent, Quote.followup_disabled,
+    Quote.entered_remarket, Quote.converted_sale_id, Quote.lost_reason,
+    Quote.nowcerts_prospect_created, Quote.producer_id, Quote.producer_name,
+    Quote.created_at, Quote.email_variant, Quote.reply_received, Quote.reply_received_at,
+    Quote.coverage_dwelling, Quote.coverage_personal_property, Quote.coverage_liability,
+    Quote.auto_bi_limit, Quote.auto_pd_limit, Quote.auto_um_limit,
+)
+
+
+def _quote_to_dict(q: Quote, now: Optional[datetime] = None) -> dict:
+    """Serialize a quote (entity or _QUOTE_DICT_COLUMNS row). List callers
+    pass one `now` for the whole page."""
     days_since_sent = None
     if q.email_sent_at:
         sent = q.email_sent_at.replace(tzinfo=None) if q.email_sent_at.tzinfo else q.email_sent_at
-        days_since_sent = (datetime.utcnow() - sent).days
+        days_since_sent = ((now or datetime.utcnow()) - sent).days
 
     return {
         "id": q.id,
@@ -205,7 +265,7 @@ def _quote_to_dict(q: Quote) -> dict:
         "followup_3day_sent": q.followup_3day_sent,
         "followup_7day_sent": q.followup_7day_sent,
         "followup_14day_sent": q.followup_14day_sent,
-        "followup_disabled": getattr(q, 'followup_disabled', False) or False,
+        "followup_disabled": q.followup_disabled or False,
         "entered_remarket": q.entered_remarket,
         "converted_sale_id": q.converted_sale_id,
         "lost_reason": q.lost_reason,
@@ -227,25 +287,22 @@ def _quote_to_dict(q: Quote) -> dict:
     }
 
 
-# ── Helper: Find sibling quotes (same prospect bundle) ──
-
-def _find_sibling_quotes(db: Session, quote: Quote):
-    """Find other quotes for the same prospect (same name + email, created within 60 seconds)."""
-    from sqlalchemy import and_
-    filters = [
-        Quote.prospect_name == quote.prospect_name,
-        Quote.id != quote.id,
-    ]
-    if quote.prospect_email:
-        filters.append(Quote.prospect_email == quote.prospect_email)
-    if quote.created_at:
-        from datetime import timedelta
-        window_start = quote.created_at - timedelta(seconds=60)
-        window_end = quote.created_at + timedelta(seconds=60)
-        filters.append(Quote.created_at.between(window_start, window_end))
+# ── Helper: Bundle lines for the quote email ──
 
-    siblings = db.query(Quote).filter(and_(*filters)).all()
-    return [quote] + siblings  # include self
+def _bundle_summary(quote) -> tuple:
+    """Return (policy lines, per-line email summary). The summary is only
+    built for bundles (more than one line); otherwise it's empty."""
+    lines = json.loads(quote.policy_lines) if quote.policy_lines else []
+    quotes_summary = []
+    if len(lines) > 1:
+        carrier_display = (quote.carrier or "").replace("_", " ")
+        for line in lines:
+            quotes_summary.append({
+                "carrier": carrier_display,
+                "policy_type": (line.get("policy_type") or "").replace("_", " "),
+                "premium": f"${float(line.get('premium') or line.get('written_premium') or 0):,.2f}",
+            })
+    return lines, quotes_summary
 
 
 # ── Endpoints ──
@@ -367,15 +424,38 @@ COVERAGE LIMITS (per policy in policies[]):
 - Return ONLY the JSON, no markdown, no explanation"""
 
 
+# Shared client for Claude extraction calls: keeps connections alive so
+# back-to-back uploads skip the TLS handshake. Closed in main.lifespan.
+_ANTHROPIC_CLIENT = httpx.AsyncClient(
+    base_url="https://api.anthropic.com",
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+    headers={"anthropic-version": "2023-06-01", "content-type": "application/json"},
+)
+
+
+async def close_anthropic_client():
+    await _ANTHROPIC_CLIENT.aclose()
+
+
+# Background extraction jobs (key=task_id). In-process: the API runs as a
+# single uvicorn process, and jobs only need to outlive the client's polling.
+_EXTRACT_JOBS: dict = {}
+_EXTRACT_JOB_TTL_SECONDS = 3600
+
+
 @router.post("/extract-pdf")
 async def extract_quote_pdf(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    background: bool = Query(False),
     current_user: User = Depends(get_current_user),
 ):
-    """Upload a quote PDF and extract prospect/quote info via Claude."""
-    import base64
-    import httpx
+    """Upload a quote PDF and extract prospect/quote info via Claude.
 
+    Set background=true to get a task_id back immediately and poll
+    GET /extract-pdf/{task_id} for the result instead of holding the
+    request open for the Claude call."""
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
@@ -384,45 +464,88 @@ async def extract_quote_pdf(
     if not settings.ANTHROPIC_API_KEY:
         raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY not configured")
 
-    # Truncate large PDFs
-    from app.services.pdf_extract import truncate_pdf
-    pdf_bytes = truncate_pdf(pdf_bytes, max_pages=10)
-    pdf_base64 = base64.standard_b64encode(pdf_bytes).decode("utf-8")
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "x-api-key": settings.ANTHROPIC_API_KEY,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json",
-            },
-            json={
-                "model": "claude-sonnet-4-20250514",
-                "max_tokens": 2000,
-                "messages": [{
-                    "role": "user",
-                    "content": [
-                        {"type": "document", "source": {"type": "base64", "media_type": "application/pdf", "data": pdf_base64}},
-                        {"type": "text", "text": QUOTE_EXTRACTION_PROMPT},
-                    ],
-                }],
-            },
-        )
+    if background:
+        now = time.time()
+        for task_id in [k for k, job in _EXTRACT_JOBS.items() if job["expires_at"] <= now]:
+            del _EXTRACT_JOBS[task_id]
+        task_id = uuid.uuid4().hex
+        _EXTRACT_JOBS[task_id] = {
+            "user_id": current_user.id,
+            "status": "processing",
+            "result": None,
+            "error": None,
+            "expires_at": now + _EXTRACT_JOB_TTL_SECONDS,
+        }
+        background_tasks.add_task(_run_extract_job, task_id, pdf_bytes)
+        return {"task_id": task_id, "status": "processing"}
+
+    return await _extract_quote_fields(pdf_bytes)
+
+
+@router.get("/extract-pdf/{task_id}")
+def get_extract_pdf_result(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """Poll a background extract-pdf job: processing, completed (with result) or error."""
+    job = _EXTRACT_JOBS.get(task_id)
+    if not job or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Extraction task not found or expired")
+    return {"task_id": task_id, "status": job["status"], "result": job["result"], "error": job["error"]}
+
+
+async def _run_extract_job(task_id: str, pdf_bytes: bytes):
+    """BackgroundTask entry point: run _extract_quote_fields and record the outcome."""
+    job = _EXTRACT_JOBS.get(task_id)
+    if job is None:
+        return
+    try:
+        job["result"] = await _extract_quote_fields(pdf_bytes)
+        job["status"] = "completed"
+    except HTTPException as e:
+        job["status"], job["error"] = "error", e.detail
+    except Exception as e:
+        logger.error("Background quote PDF extraction %s failed: %s", task_id, e)
+        job["status"], job["error"] = "error", str(e)
+
+
+async def _extract_quote_fields(pdf_bytes: bytes) -> dict:
+    """Extract one quote PDF via Claude and map it to quote form fields."""
+    import asyncio
+
+    # Truncate large PDFs (PyPDF2 parse is CPU-bound — keep it off the event loop)
+    from app.services.pdf_extract import b64encode_pdf, truncate_pdf
+    pdf_bytes = await asyncio.to_thread(truncate_pdf, pdf_bytes, max_pages=10)
+    pdf_base64 = b64encode_pdf(pdf_bytes)
+
+    response = await _ANTHROPIC_CLIENT.post(
+        "/v1/messages",
+        headers={"x-api-key": settings.ANTHROPIC_API_KEY},
+        json={
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 2000,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {"type": "document", "source": {"type": "base64", "media_type": "application/pdf", "data": pdf_base64}},
+                    {"type": "text", "text": QUOTE_EXTRACTION_PROMPT},
+                ],
+            }],
+        },
+    )
 
     if response.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Claude API error ({response.status_code})")
 
     # Parse response
-    import json as jsonlib
     text = ""
-    for block in response.json().get("content", []):
+    for block in orjson.loads(response.content).get("content", []):
         if block.get("type") == "text":
             text += block["text"]
     text = text.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
 
     try:
-        raw = jsonlib.loads(text)
+        raw = orjson.loads(text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse extraction: {e}")
 
@@ -505,46 +628,40 @@ async def extract_quote_pdf(
 async def _extract_one_pdf(pdf_bytes: bytes) -> dict:
     """Run Claude extraction on a single PDF. Returns the parsed dict,
     or {} on failure so the caller can keep merging the rest."""
-    import base64, httpx, re
-    import json as jsonlib
-    from app.services.pdf_extract import truncate_pdf
+    import re
+    from app.services.pdf_extract import b64encode_pdf, truncate_pdf
 
     if not settings.ANTHROPIC_API_KEY:
         raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY not configured")
 
     truncated = truncate_pdf(pdf_bytes, max_pages=10)
-    pdf_b64 = base64.standard_b64encode(truncated).decode("utf-8")
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        resp = await client.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "x-api-key": settings.ANTHROPIC_API_KEY,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json",
-            },
-            json={
-                "model": "claude-sonnet-4-20250514",
-                "max_tokens": 2000,
-                "messages": [{
-                    "role": "user",
-                    "content": [
-                        {"type": "document", "source": {"type": "base64", "media_type": "application/pdf", "data": pdf_b64}},
-                        {"type": "text", "text": QUOTE_EXTRACTION_PROMPT},
-                    ],
-                }],
-            },
-        )
+    pdf_b64 = b64encode_pdf(truncated)
+
+    resp = await _ANTHROPIC_CLIENT.post(
+        "/v1/messages",
+        headers={"x-api-key": settings.ANTHROPIC_API_KEY},
+        json={
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 2000,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {"type": "document", "source": {"type": "base64", "media_type": "application/pdf", "data": pdf_b64}},
+                    {"type": "text", "text": QUOTE_EXTRACTION_PROMPT},
+                ],
+            }],
+        },
+    )
     if resp.status_code != 200:
         logger.warning("Multi-PDF extraction: Claude returned %s — %s", resp.status_code, resp.text[:200])
         return {}
     try:
-        data = resp.json()
+        data = orjson.loads(resp.content)
         text = data["content"][0]["text"].strip()
         # Strip ```json fencing if present
         text = re.sub(r"^```(?:json)?\s*", "", text)
         text = re.sub(r"\s*```$", "", text)
-        return jsonlib.loads(text)
+        return orjson.loads(text)
     except Exception as e:
         logger.warning("Multi-PDF extraction: parse failed — %s", e)
         return {}
@@ -701,10 +818,7 @@ async def upload_quote_pdf(
     # Save file
     safe_name = f"quote_{quote_id}_{int(datetime.utcnow().timestamp())}_{file.filename}"
     file_path = upload_dir / safe_name
-    pdf_bytes = await file.read()
-
-    with open(file_path, "wb") as f:
-        f.write(pdf_bytes)
+    size = await _save_upload(file, file_path)
 
     # Update legacy single-file fields AND append to the new list field
     quote.quote_pdf_path = str(file_path)
@@ -718,7 +832,7 @@ async def upload_quote_pdf(
         "id": quote.id,
         "pdf_uploaded": True,
         "filename": file.filename,
-        "size_kb": round(len(pdf_bytes) / 1024, 1),
+        "size_kb": round(size / 1024, 1),
         "total_pdfs": len(paths),
     }
 
@@ -756,11 +870,9 @@ async def upload_quote_pdfs(
     for i, f in enumerate(files):
         safe_name = f"quote_{quote_id}_{ts}_{i}_{f.filename}"
         file_path = upload_dir / safe_name
-        pdf_bytes = await f.read()
-        with open(file_path, "wb") as out:
-            out.write(pdf_bytes)
+        size = await _save_upload(f, file_path)
         paths.append({"path": str(file_path), "filename": f.filename})
-        saved.append({"filename": f.filename, "size_kb": round(len(pdf_bytes) / 1024, 1)})
+        saved.append({"filename": f.filename, "size_kb": round(size / 1024, 1)})
 
     # Keep legacy field pointing at the LAST file so older code paths
     # still attach something reasonable.
@@ -816,7 +928,7 @@ def send_quote_email_endpoint(
     db: Session = Depends(get_db),
 ):
     """Send the carrier-branded quote email with PDF attached."""
-    quote = db.query(Quote).filter(Quote.id == quote_id).first()
+    quote = db.execute(select(Quote).where(Quote.id == quote_id)).scalar_one_or_none()
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
 
@@ -838,17 +950,8 @@ def send_quote_email_endpoint(
     producer_email = getattr(current_user, 'email', '') or "service@betterchoiceins.com"
 
     # Check for multiple policy lines (bundle)
-    lines = json.loads(quote.policy_lines) if quote.policy_lines else []
+    lines, quotes_summary = _bundle_summary(quote)
     is_multi = len(lines) > 1
-    quotes_summary = []
-    if is_multi:
-        carrier_display = (quote.carrier or "").replace("_", " ")
-        for line in lines:
-            quotes_summary.append({
-                "carrier": carrier_display,
-                "policy_type": (line.get("policy_type") or "").replace("_", " "),
-                "premium": f"${float(line.get('premium') or line.get('written_premium') or 0):,.2f}",
-            })
 
     # ── A/B variant assignment ─────────────────────────────────────
     # If this quote has never been sent, randomly pick A or B and persist it
@@ -916,12 +1019,11 @@ def send_quote_email_endpoint(
         quote.email_sent_at = datetime.utcnow()
         quote.status = "sent"
 
-        # Create NowCerts prospect if not already done
+        # Create NowCerts prospect (if not already done) on the CRM pool while
+        # this thread fires the GHL webhook — the two calls are independent
+        nc_future = None
         if not quote.nowcerts_prospect_created:
-            nc_result = _create_nowcerts_prospect(quote)
-            if nc_result:
-                quote.nowcerts_prospect_created = True
-                quote.nowcerts_note_added = True
+            nc_future = _crm_executor.submit(_create_nowcerts_prospect, quote)
 
         # Fire GHL webhook
         try:
@@ -940,6 +1042,10 @@ def send_quote_email_endpoint(
         except Exception as e:
             logger.debug(f"GHL webhook failed: {e}")
 
+        if nc_future is not None and nc_future.result():
+            quote.nowcerts_prospect_created = True
+            quote.nowcerts_note_added = True
+
         db.commit()
 
     return {
@@ -966,43 +1072,52 @@ def list_quotes(
     - Admin/Manager: see all quotes
     - Producers: see their own quotes, but can search all
     """
-    query = db.query(Quote)
+    preds = []
 
     # When searching, everyone can search all quotes
     if search and search.strip():
         s = f"%{search.strip()}%"
-        query = query.filter(
-            (Quote.prospect_name.ilike(s)) |
-            (Quote.prospect_email.ilike(s)) |
-            (Quote.prospect_phone.ilike(s)) |
-            (Quote.carrier.ilike(s)) |
-            (Quote.producer_name.ilike(s))
-        )
+        preds.append(or_(
+            Quote.prospect_name.ilike(s),
+            Quote.prospect_email.ilike(s),
+            Quote.prospect_phone.ilike(s),
+            Quote.carrier.ilike(s),
+            Quote.producer_name.ilike(s),
+        ))
     else:
         # Default view: admins see all, producers see own
         if current_user.role.lower() not in ("admin", "manager"):
-            query = query.filter(Quote.producer_id == current_user.id)
+            preds.append(Quote.producer_id == current_user.id)
         elif producer_id:
-            query = query.filter(Quote.producer_id == producer_id)
+            preds.append(Quote.producer_id == producer_id)
 
     if status:
-        query = query.filter(Quote.status == status)
+        preds.append(Quote.status == status)
     if carrier:
-        query = query.filter(Quote.carrier.ilike(f"%{carrier}%"))
+        preds.append(Quote.carrier.ilike(f"%{carrier}%"))
     if days:
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        query = query.filter(Quote.created_at >= cutoff)
+        preds.append(Quote.created_at >= datetime.utcnow() - timedelta(days=days))
 
-    quotes = query.order_by(Quote.created_at.desc()).limit(200).all()
+    stmt = select(*_QUOTE_DICT_COLUMNS).where(*preds).order_by(Quote.created_at.desc()).limit(200)
+    quotes = db.execute(stmt).all()
+    now = datetime.utcnow()
 
     return {
         "total": len(quotes),
-        "quotes": [_quote_to_dict(q) for q in quotes],
+        "quotes": [_quote_to_dict(q, now) for q in quotes],
     }
 
 
 
 
+# Rendered email previews, keyed by every input to the render (the quote
+# columns read below plus the sending producer), so an edited quote simply
+# misses and nothing has to invalidate entries. Same single-process rationale
+# as _EXTRACT_JOBS.
+_PREVIEW_CACHE: dict = {}
+_PREVIEW_CACHE_TTL_SECONDS = 300
+
+
 @router.get("/{quote_id}/email-preview")
 def preview_quote_email(
     quote_id: int,
@@ -1010,10 +1125,25 @@ def preview_quote_email(
     db: Session = Depends(get_db),
 ):
     """Return the quote email HTML for preview without sending."""
-    quote = db.query(Quote).filter(Quote.id == quote_id).first()
+    quote = db.execute(
+        select(
+            Quote.id, Quote.prospect_name, Quote.prospect_email, Quote.carrier,
+            Quote.policy_type, Quote.quoted_premium, Quote.premium_term,
+            Quote.effective_date, Quote.policy_lines, Quote.producer_name,
+        ).where(Quote.id == quote_id)
+    ).first()
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
 
+    producer_name = quote.producer_name or current_user.username
+    producer_email = getattr(current_user, 'email', '') or "service@betterchoiceins.com"
+
+    now = time.time()
+    cache_key = (tuple(quote), producer_name, producer_email)
+    cached = _PREVIEW_CACHE.get(cache_key)
+    if cached and cached[1] > now:
+        return cached[0]
+
     from app.services.quote_email import build_quote_email_html
 
     premium_str = f"${float(quote.quoted_premium):,.2f}" if quote.quoted_premium else "$0.00"
@@ -1021,21 +1151,9 @@ def preview_quote_email(
     if quote.effective_date:
         eff_str = quote.effective_date.strftime if quote.effective_date else "your upcoming renewal date"; eff_str = quote.effective_date.strftime("%B %d, %Y") if quote.effective_date else "your upcoming renewal date"
 
-    producer_name = quote.producer_name or current_user.username
-    producer_email = getattr(current_user, 'email', '') or "service@betterchoiceins.com"
-
     # Check for multiple policy lines (bundle)
-    lines = json.loads(quote.policy_lines) if quote.policy_lines else []
+    lines, quotes_summary = _bundle_summary(quote)
     is_multi = len(lines) > 1
-    quotes_summary = []
-    if is_multi:
-        carrier_display = (quote.carrier or "").replace("_", " ")
-        for line in lines:
-            quotes_summary.append({
-                "carrier": carrier_display,
-                "policy_type": (line.get("policy_type") or "").replace("_", " "),
-                "premium": f"${float(line.get('premium') or line.get('written_premium') or 0):,.2f}",
-            })
 
     html = build_quote_email_html(
         prospect_name=quote.prospect_name,
@@ -1052,7 +1170,7 @@ def preview_quote_email(
         quote_id=quote.id,
     )
 
-    return {
+    result = {
         "html": html,
         "to": quote.prospect_email,
         "prospect_name": quote.prospect_name,
@@ -1061,6 +1179,10 @@ def preview_quote_email(
         "is_bundle": is_multi,
         "line_count": len(lines),
     }
+    for key in [k for k, entry in _PREVIEW_CACHE.items() if entry[1] <= now]:
+        del _PREVIEW_CACHE[key]
+    _PREVIEW_CACHE[cache_key] = (result, now + _PREVIEW_CACHE_TTL_SECONDS)
+    return result
 
 
 @router.post("/check-followups")
@@ -1256,10 +1378,13 @@ def check_followups_verbose(
     now = datetime.utcnow()
     details = []
 
-    active_quotes = db.query(Quote).filter(
-        Quote.status.in_(["sent", "following_up", "bind_requested", "remarket"]),
-        Quote.email_sent == True,
-        Quote.email_sent_at.isnot(None),
+    # Read-only report: plain rows with just the columns used below
+    active_quotes = db.execute(
+        select(
+            Quote.prospect_name, Quote.prospect_email, Quote.carrier, Quote.status,
+            Quote.email_sent_at, Quote.created_at, Quote.followup_disabled,
+            Quote.followup_3day_sent, Quote.followup_7day_sent, Quote.followup_14day_sent,
+        ).where(*_FOLLOWUP_SCAN)
     ).all()
 
     prospect_groups: dict = defaultdict(list)
@@ -1271,7 +1396,7 @@ def check_followups_verbose(
         quotes.sort(key=lambda q: q.email_sent_at or q.created_at, reverse=True)
         latest = quotes[0]
 
-        if any(getattr(q, 'followup_disabled', False) for q in quotes):
+        if any(q.followup_disabled for q in quotes):
             details.append({"name": latest.prospect_name, "action": "skipped_disabled"})
             continue
         if _has_matching_sale(db, latest.prospect_name or "", latest.prospect_email or "", latest.carrier or ""):
@@ -1312,10 +1437,10 @@ def reset_followup_flags(
     # Find quotes with fu3=True but status still 'following_up' and sent 3-14 days ago
     # These likely had failed sends
     quotes = db.query(Quote).filter(
-        Quote.followup_3day_sent == True,
+        Quote.followup_3day_sent,
         Quote.status.in_(["following_up", "sent"]),
         Quote.email_sent_at.isnot(None),
-        Quote.followup_disabled == False,
+        Quote.followup_disabled.is_(False),
     ).all()
 
     for q in quotes:
@@ -1342,34 +1467,35 @@ def quote_stats(
     # Current month quotes
     month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
-    query = db.query(Quote)
+    # One GROUP BY status pass: per-status count, emailed count and MTD count
+    query = db.query(
+        Quote.status,
+        func.count(Quote.id),
+        func.count(Quote.id).filter(Quote.email_sent.is_(True)),
+        func.count(Quote.id).filter(Quote.created_at >= month_start),
+    )
     if current_user.role.lower() not in ("admin", "manager"):
         query = query.filter(Quote.producer_id == current_user.id)
 
-    all_quotes = query.all()
-    
-    # Strip timezone for comparison
-    month_start_naive = month_start
-    mtd_quotes = []
-    for q in all_quotes:
-        if q.created_at:
-            ca = q.created_at.replace(tzinfo=None) if q.created_at.tzinfo else q.created_at
-            if ca >= month_start_naive:
-                mtd_quotes.append(q)
-
-    total = len(all_quotes)
-    sent = len([q for q in all_quotes if q.email_sent])
-    converted = len([q for q in all_quotes if q.status == "converted"])
-    lost = len([q for q in all_quotes if q.status == "lost"])
-    active = len([q for q in all_quotes if q.status in ("quoted", "sent", "following_up")])
-    remarket = len([q for q in all_quotes if q.status == "remarket"])
-    quoted_count = len([q for q in all_quotes if q.status == "quoted"])
-    sent_count = len([q for q in all_quotes if q.status == "sent"])
-    following_up_count = len([q for q in all_quotes if q.status == "following_up"])
+    by_status = {}
+    total = sent = mtd = 0
+    for status, count, sent_in_status, mtd_in_status in query.group_by(Quote.status):
+        by_status[status] = count
+        total += count
+        sent += sent_in_status
+        mtd += mtd_in_status
+
+    converted = by_status.get("converted", 0)
+    lost = by_status.get("lost", 0)
+    remarket = by_status.get("remarket", 0)
+    quoted_count = by_status.get("quoted", 0)
+    sent_count = by_status.get("sent", 0)
+    following_up_count = by_status.get("following_up", 0)
+    active = quoted_count + sent_count + following_up_count
 
     return {
         "total_quotes": total,
-        "mtd_quotes": len(mtd_quotes),
+        "mtd_quotes": mtd,
         "sent": sent,
         "converted": converted,
         "lost": lost,
@@ -1395,7 +1521,7 @@ def get_quote(
     db: Session = Depends(get_db),
 ):
     """Get a single quote with all details."""
-    quote = db.query(Quote).filter(Quote.id == quote_id).first()
+    quote = db.execute(select(*_QUOTE_DICT_COLUMNS).where(Quote.id == quote_id)).first()
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
     return _quote_to_dict(quote)
@@ -1561,16 +1687,16 @@ def _check_followups_logic(db: Session) -> dict:
     """Core follow-up check logic — sends actual emails, skips if customer already bought."""
     now = datetime.utcnow()
     results = {"day3": 0, "day7": 0, "day14": 0, "day90": 0, "skipped_grouped": 0, "skipped_disabled": 0, "skipped_already_sold": 0}
+    webhook_followups = []  # GHL follow-up payloads, fired together after the commit
+    sold_ids = []  # prospects who bought — follow-ups disabled in one UPDATE
+    superseded_ids = []  # older quotes of a prospect — flagged done in one UPDATE
+    sent_updates = []  # per-quote flag changes after a send, applied by primary key
 
     from app.services.quote_followup_email import (
         build_followup_email, send_followup_email, _has_matching_sale,
     )
 
-    active_quotes = db.query(Quote).filter(
-        Quote.status.in_(["sent", "following_up", "bind_requested", "remarket"]),
-        Quote.email_sent == True,
-        Quote.email_sent_at.isnot(None),
-    ).all()
+    active_quotes = db.query(Quote).filter(*_FOLLOWUP_SCAN).all()
 
     # Group by prospect email — only follow up on the MOST RECENT quote per prospect
     from collections import defaultdict
@@ -1593,8 +1719,7 @@ def _check_followups_logic(db: Session) -> dict:
         if _has_matching_sale(db, latest.prospect_name or "", latest.prospect_email or "", latest.carrier or ""):
             results["skipped_already_sold"] += 1
             # Auto-disable follow-ups since they bought
-            for q in quotes:
-                q.followup_disabled = True
+            sold_ids.extend(q.id for q in quotes)
             continue
 
         # Handle "I'm Ready to Bind" but no sale ever uploaded — retarget
@@ -1614,7 +1739,7 @@ def _check_followups_logic(db: Session) -> dict:
                     except Exception as e:
                         logger.error(f"Bind retarget email error for {br.prospect_name}: {e}")
                     # Mark as retargeted to avoid repeat sends
-                    br.followup_14day_sent = True  # Reuse this flag as retarget marker
+                    sent_updates.append({"id": br.id, "followup_14day_sent": True})  # Reuse this flag as retarget marker
             continue
 
         sent_at = latest.email_sent_at.replace(tzinfo=None) if latest.email_sent_at.tzinfo else latest.email_sent_at
@@ -1623,9 +1748,7 @@ def _check_followups_logic(db: Session) -> dict:
         # Mark older quotes as superseded (no separate follow-ups)
         for old_q in quotes[1:]:
             if old_q.status in ("sent", "following_up"):
-                old_q.followup_3day_sent = True
-                old_q.followup_7day_sent = True
-                old_q.followup_14day_sent = True
+                superseded_ids.append(old_q.id)
                 results["skipped_grouped"] += 1
 
         # Process follow-ups on the latest quote only — send actual emails
@@ -1690,51 +1813,90 @@ def _check_followups_logic(db: Session) -> dict:
             # Only mark flags if email actually sent
             if email_sent:
                 if followup_day == 3:
-                    latest.followup_3day_sent = True
-                    latest.status = "following_up"
+                    sent_updates.append({"id": latest.id, "followup_3day_sent": True, "status": "following_up"})
                     results["day3"] += 1
                 elif followup_day == 7:
-                    latest.followup_7day_sent = True
+                    sent_updates.append({"id": latest.id, "followup_7day_sent": True})
                     results["day7"] += 1
                 elif followup_day == 14:
-                    latest.followup_14day_sent = True
+                    sent_updates.append({"id": latest.id, "followup_14day_sent": True})
                     results["day14"] += 1
                 elif followup_day in (30, 60, 90, 180):
                     # Unified remarket bookkeeping — bump touch count + timestamp
                     # so the next scheduler tick correctly skips this quote.
-                    latest.status = "remarket"
-                    latest.entered_remarket = True
-                    if not latest.remarket_start_date:
-                        latest.remarket_start_date = now
-                    latest.last_remarket_sent_at = now
-                    latest.remarket_touch_count = (getattr(latest, 'remarket_touch_count', 0) or 0) + 1
+                    sent_updates.append({
+                        "id": latest.id,
+                        "status": "remarket",
+                        "entered_remarket": True,
+                        "remarket_start_date": latest.remarket_start_date or now,
+                        "last_remarket_sent_at": now,
+                        "remarket_touch_count": (latest.remarket_touch_count or 0) + 1,
+                    })
                     results["retarget"] = results.get("retarget", 0) + 1
                 elif followup_day == "remarket_quarterly":
-                    latest.last_remarket_sent_at = now
-                    latest.remarket_touch_count = (getattr(latest, 'remarket_touch_count', 0) or 0) + 1
+                    sent_updates.append({
+                        "id": latest.id,
+                        "last_remarket_sent_at": now,
+                        "remarket_touch_count": (latest.remarket_touch_count or 0) + 1,
+                    })
                     results["remarket_longterm"] = results.get("remarket_longterm", 0) + 1
             else:
                 results["send_failed"] = results.get("send_failed", 0) + 1
 
         # Also fire GHL webhook (keep existing behavior)
         if followup_day:
-            _fire_followup_webhook(latest, followup_day)
+            webhook_followups.append(_followup_webhook_payload(latest, followup_day))
+
+    # Sent-email flags, collected only for sends that succeeded; one
+    # executemany UPDATE by primary key instead of per-instance flushes
+    if sent_updates:
+        db.execute(update(Quote), sent_updates)
+
+    # Bulk bookkeeping for quotes that get no email of their own
+    if sold_ids:
+        db.execute(
+            update(Quote)
+            .where(Quote.id.in_(sold_ids), Quote.followup_disabled.isnot(True))
+            .values(followup_disabled=True)
+            .execution_options(synchronize_session=False)
+        )
+    if superseded_ids:
+        db.execute(
+            update(Quote)
+            .where(
+                Quote.id.in_(superseded_ids),
+                or_(
+                    Quote.followup_3day_sent.isnot(True),
+                    Quote.followup_7day_sent.isnot(True),
+                    Quote.followup_14day_sent.isnot(True),
+                ),
+            )
+            .values(followup_3day_sent=True, followup_7day_sent=True, followup_14day_sent=True)
+            .execution_options(synchronize_session=False)
+        )
 
     db.commit()
+    _fire_followup_webhooks(webhook_followups)
     return results
 
 
-def _fire_followup_webhook(quote, days_since):
-    """Fire GHL webhook for follow-up."""
+def _followup_webhook_payload(quote, days_since) -> dict:
+    """fire_quote_followup kwargs for a quote (captured before commit expires it)."""
+    return dict(
+        prospect_name=quote.prospect_name, email=quote.prospect_email or "",
+        phone=quote.prospect_phone or "", carrier=quote.carrier,
+        policy_type=quote.policy_type, days_since=days_since,
+        producer_name=quote.producer_name or "",
+    )
+
+
+def _fire_followup_webhooks(followups: list):
+    """Fire GHL webhooks for follow-ups over one connection."""
+    if not followups:
+        return
     try:
         from app.services.ghl_webhook import get_ghl_service
-        ghl = get_ghl_service()
-        ghl.fire_quote_followup(
-            prospect_name=quote.prospect_name, email=quote.prospect_email or "",
-            phone=quote.prospect_phone or "", carrier=quote.carrier,
-            policy_type=quote.policy_type, days_since=days_since,
-            producer_name=quote.producer_name or "",
-        )
+        get_ghl_service().fire_quote_followups(followups)
     except Exception:
         pass
 
@@ -1772,13 +1934,10 @@ def ab_test_stats(
         raise HTTPException(status_code=403, detail="Admin/manager only")
 
     cutoff = datetime.utcnow() - timedelta(days=days)
-    quotes = (
-        db.query(Quote)
-        .filter(Quote.email_sent == True)
-        .filter(Quote.email_sent_at >= cutoff)
-        .filter(Quote.email_variant.isnot(None))
-        .all()
-    )
+    quotes = db.execute(
+        select(Quote.email_variant, Quote.reply_received, Quote.converted_sale_id, Quote.status)
+        .where(Quote.email_sent, Quote.email_sent_at >= cutoff, Quote.email_variant.isnot(None))
+    ).all()
 
     def _summarize(arm_quotes):
         sent = len(arm_quotes)
@@ -284,7 +284,7 @@ def calculate_monthly_pay(
 
     service = ReconciliationService(db)
     try:
-        return service.calculate_monthly_pay(period)
+        return service.calculate_monthly_pay_cached(period)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
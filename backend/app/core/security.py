@@ -87,3 +87,18 @@ async def get_current_active_producer(
             detail="Not authorized. Producer role required."
         )
     return current_user
+
+
+def require_roles(*roles: str, detail: str = "Admin access required"):
+    """Dependency factory: the current user, 403 unless their role is in `roles`.
+
+    Usage: current_user: User = Depends(require_roles("admin", "manager"))
+    """
+    allowed = frozenset(r.lower() for r in roles)
+
+    async def dependency(current_user: User = Depends(get_current_user)) -> User:
+        if (current_user.role or "").lower() not in allowed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return current_user
+
+    return dependency
@@ -212,6 +212,12 @@ def init_database():
                             ALTER TABLE payroll_agent_lines ADD COLUMN commission_sheet_send_error TEXT;
                         END IF;
                     END IF;
+                    -- Optimistic-lock counter for PayrollRecord (mapper version_id_col)
+                    IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name='payroll_records') THEN
+                        IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='payroll_records' AND column_name='version_id') THEN
+                            ALTER TABLE payroll_records ADD COLUMN version_id INTEGER NOT NULL DEFAULT 1;
+                        END IF;
+                    END IF;
                 END $$;
             """))
             conn.commit()
@@ -219,6 +225,52 @@ def init_database():
         except Exception as e:
             logger.warning(f"Enum migration warning (may be OK): {e}")
 
+    # Payroll upsert support: unique period (ON CONFLICT target) and
+    # cascading line deletes. Fails harmlessly if duplicate periods exist.
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_index i
+                        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                        WHERE i.indrelid = 'payroll_records'::regclass AND i.indisunique
+                          AND i.indnatts = 1 AND a.attname = 'period'
+                    ) THEN
+                        DROP INDEX IF EXISTS ix_payroll_records_period;
+                        CREATE UNIQUE INDEX ix_payroll_records_period ON payroll_records(period);
+                    END IF;
+                    IF EXISTS (
+                        SELECT 1 FROM pg_constraint
+                        WHERE conname = 'payroll_agent_lines_payroll_record_id_fkey' AND confdeltype <> 'c'
+                    ) THEN
+                        ALTER TABLE payroll_agent_lines DROP CONSTRAINT payroll_agent_lines_payroll_record_id_fkey;
+                        ALTER TABLE payroll_agent_lines ADD CONSTRAINT payroll_agent_lines_payroll_record_id_fkey
+                            FOREIGN KEY (payroll_record_id) REFERENCES payroll_records(id) ON DELETE CASCADE;
+                    END IF;
+                END $$;
+            """))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"payroll upsert migration: {e}")
+
+    # Composite indexes for the payroll statement -> matched sale subquery
+    # and the payroll detail lines (ordered by net pay)
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_statement_lines_import_matched_sale "
+                "ON statement_lines(statement_import_id, is_matched, matched_sale_id)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_payroll_agent_lines_record_pay "
+                "ON payroll_agent_lines(payroll_record_id, net_agent_pay DESC)"
+            ))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"payroll/statement index migration: {e}")
+
     # Convert enum columns to varchar for flexibility
     with engine.connect() as conn:
         try:
@@ -426,6 +478,46 @@ def init_database():
         except Exception as e:
             logger.warning(f"agency_snapshots migration: {e}")
 
+    # nonpay_emails — at most one live contact per policy per calendar week,
+    # enforced by the DB so concurrent uploads of the same notice can't double-send.
+    # (AT TIME ZONE makes the expression IMMUTABLE, which Postgres requires for indexes.)
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS ux_nonpay_emails_policy_week
+                ON nonpay_emails (policy_number, (date_trunc('week', sent_at AT TIME ZONE 'UTC')))
+                WHERE email_status IN ('sent', 'letter_sent')
+            """))
+            # Rate-limit lookups (latest sent_at per policy/status this week)
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_nonpay_emails_rate
+                ON nonpay_emails (policy_number, email_status, sent_at DESC)
+                WHERE email_status IN ('sent', 'letter_sent')
+            """))
+            conn.commit()
+            logger.info("nonpay_emails weekly unique + rate-limit indexes ready")
+        except Exception as e:
+            logger.warning(f"nonpay_emails weekly index migration: {e}")
+
+    # customer_policies.policy_number_norm — normalized copy of policy_number so
+    # non-pay fuzzy matching can use equality / prefix index lookups instead of
+    # a leading-% ILIKE scan per miss. text_pattern_ops makes LIKE 'X%' indexable.
+    with engine.connect() as conn:
+        try:
+            from app.models.customer import POLICY_NUMBER_NORM_SQL
+            conn.execute(text(f"""
+                ALTER TABLE customer_policies ADD COLUMN IF NOT EXISTS policy_number_norm VARCHAR
+                GENERATED ALWAYS AS ({POLICY_NUMBER_NORM_SQL}) STORED
+            """))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_customer_policies_policy_number_norm
+                ON customer_policies (policy_number_norm text_pattern_ops)
+            """))
+            conn.commit()
+            logger.info("customer_policies policy_number_norm ready")
+        except Exception as e:
+            logger.warning(f"customer_policies policy_number_norm migration: {e}")
+
     # system_settings table — runtime-tunable singleton key/value store
     # Used for outreach scheduler caps and similar UI-controlled config
     # so Evan can tune pace without redeploying. See app/services/system_settings.py
@@ -725,6 +817,10 @@ def init_database():
             "ALTER TABLE quotes ADD COLUMN auto_um_limit VARCHAR(50)",   # e.g. "100/300"
             # Multi-PDF (Apr 2026) — list of attached PDFs
             "ALTER TABLE quotes ADD COLUMN quote_pdf_paths JSON",
+            # Indexes: pipeline stats, follow-up scan, quote list
+            "CREATE INDEX IF NOT EXISTS ix_quotes_producer_status_created ON quotes(producer_id, status, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_quotes_followup_scan ON quotes(status, email_sent, email_sent_at)",
+            "CREATE INDEX IF NOT EXISTS ix_quotes_producer_created ON quotes(producer_id, created_at DESC, status)",
         ]:
             try:
                 with engine.connect() as conn:
@@ -1765,6 +1861,9 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    from app.api.quotes import close_anthropic_client
+    await close_anthropic_client()
+
 
 # Disable API docs in production
 docs_url = "/docs" if settings.ENVIRONMENT != "production" else None
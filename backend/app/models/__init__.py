@@ -5,7 +5,7 @@ from app.models.statement import (
     StatementStatus, CarrierType, TransactionType,
 )
 from app.models.commission import Commission, CommissionTier, CommissionStatus
-from app.models.payroll import PayrollRecord, PayrollAgentLine
+from app.models.payroll import PayrollRecord, PayrollAgentLine, PayrollIdempotencyKey
 from app.models.survey import SurveyResponse
 from app.models.agency_config import AgencyConfig
 from app.models.timeclock import TimeClockEntry
@@ -32,6 +32,7 @@ __all__ = [
     "CommissionStatus",
     "PayrollRecord",
     "PayrollAgentLine",
+    "PayrollIdempotencyKey",
     "SurveyResponse",
     "TimeClockEntry",
     "Customer",
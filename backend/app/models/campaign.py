@@ -1,5 +1,5 @@
 """Models for automation campaigns: renewals, UW requirements, win-back, quotes, onboarding."""
-from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -394,6 +394,15 @@ class Quote(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Per-producer pipeline stats (GROUP BY status, MTD by created_at)
+        Index("ix_quotes_producer_status_created", "producer_id", "status", "created_at"),
+        # Follow-up scheduler scan
+        Index("ix_quotes_followup_scan", "status", "email_sent", "email_sent_at"),
+        # Quote list: newest first, optionally per producer
+        Index("ix_quotes_producer_created", "producer_id", created_at.desc(), "status"),
+    )
+
 
 # ═══════════════════════════════════════════════════════════════════
 # ONBOARDING CAMPAIGN
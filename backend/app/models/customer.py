@@ -1,8 +1,12 @@
 """Customer model — local cache of NowCerts insured data."""
-from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, JSON, Computed
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
+# Must stay IMMUTABLE (generated column); mirrors _policy_number_variants()[0].upper()
+POLICY_NUMBER_NORM_SQL = "upper(replace(replace(replace(policy_number, ' ', ''), '-', ''), chr(9), ''))"
+
 
 class Customer(Base):
     __tablename__ = "customers"
@@ -51,6 +55,13 @@ class CustomerPolicy(Base):
 
     # Policy info
     policy_number = Column(String, nullable=True, index=True)
+    # Upper-cased, without spaces/dashes/tabs — for fuzzy non-pay matching.
+    # Indexed with text_pattern_ops in init_database() so prefix LIKE can use it.
+    policy_number_norm = Column(
+        String,
+        Computed(POLICY_NUMBER_NORM_SQL, persisted=True),
+        nullable=True,
+    )
     carrier = Column(String, nullable=True)
     line_of_business = Column(String, nullable=True)  # Auto, Home, etc.
     policy_type = Column(String, nullable=True)
@@ -72,3 +83,10 @@ class CustomerPolicy(Base):
     last_synced_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # No FK constraint on customer_id, so the join is spelled out; read-only
+    customer = relationship(
+        "Customer",
+        primaryjoin="foreign(CustomerPolicy.customer_id) == Customer.id",
+        viewonly=True,
+    )
@@ -1,5 +1,5 @@
 """Non-pay / past-due notice tracking models."""
-from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Boolean, JSON, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -56,3 +56,11 @@ class NonPayEmail(Base):
 
     sent_at = Column(DateTime(timezone=True), server_default=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Weekly rate-limit lookups: latest live contact per policy/status
+        Index(
+            "ix_nonpay_emails_rate", "policy_number", "email_status", sent_at.desc(),
+            postgresql_where=email_status.in_(["sent", "letter_sent"]),
+        ),
+    )
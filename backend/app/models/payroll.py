@@ -1,6 +1,6 @@
 """Payroll models for finalized monthly commission records."""
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, Text, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, Text, ForeignKey, JSON, Index
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -12,7 +12,7 @@ class PayrollRecord(Base):
     id = Column(Integer, primary_key=True, index=True)
 
     # Period
-    period = Column(String, nullable=False, index=True)  # "2026-01"
+    period = Column(String, nullable=False, unique=True, index=True)  # "2026-01"
     period_display = Column(String, nullable=True)  # "January 2026"
 
     # Status
@@ -29,8 +29,9 @@ class PayrollRecord(Base):
     total_chargebacks = Column(Numeric(12, 2), default=0)
     total_carriers = Column(Integer, default=0)
 
-    # Full snapshot data (JSON blob of the monthly pay result)
-    snapshot_data = Column(JSON, nullable=True)
+    # Full snapshot data (JSON blob of the monthly pay result). Can be large,
+    # so it is deferred: load it with undefer() where it is actually read.
+    snapshot_data = deferred(Column(JSON, nullable=True))
 
     # Notes
     notes = Column(Text, nullable=True)
@@ -39,9 +40,14 @@ class PayrollRecord(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Optimistic lock — every ORM UPDATE/DELETE checks and bumps it, so two
+    # admins submitting/unlocking/paying the same period can't silently overwrite
+    version_id = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version_id}
+
     # Relationships
     submitted_by = relationship("User", foreign_keys=[submitted_by_id])
-    agent_payroll_lines = relationship("PayrollAgentLine", back_populates="payroll_record", cascade="all, delete-orphan")
+    agent_payroll_lines = relationship("PayrollAgentLine", back_populates="payroll_record", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class PayrollAgentLine(Base):
@@ -49,7 +55,7 @@ class PayrollAgentLine(Base):
     __tablename__ = "payroll_agent_lines"
 
     id = Column(Integer, primary_key=True, index=True)
-    payroll_record_id = Column(Integer, ForeignKey("payroll_records.id"), nullable=False, index=True)
+    payroll_record_id = Column(Integer, ForeignKey("payroll_records.id", ondelete="CASCADE"), nullable=False, index=True)
     agent_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     # Agent info snapshot
@@ -92,3 +98,18 @@ class PayrollAgentLine(Base):
     # Relationships
     payroll_record = relationship("PayrollRecord", back_populates="agent_payroll_lines")
     agent = relationship("User", foreign_keys=[agent_id])
+
+    __table_args__ = (
+        # Detail view: a record's lines already in net_agent_pay DESC order
+        Index("ix_payroll_agent_lines_record_pay", "payroll_record_id", net_agent_pay.desc()),
+    )
+
+
+class PayrollIdempotencyKey(Base):
+    """Stored submit response for a client Idempotency-Key, replayed on retry."""
+    __tablename__ = "payroll_idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    period = Column(String, nullable=False)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum, Text, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -88,6 +88,10 @@ class StatementImport(Base):
 class StatementLine(Base):
     """Individual line from a commission statement"""
     __tablename__ = "statement_lines"
+    __table_args__ = (
+        # Covers the period -> matched sale lookup used by payroll status updates
+        Index("ix_statement_lines_import_matched_sale", "statement_import_id", "is_matched", "matched_sale_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     statement_import_id = Column(Integer, ForeignKey("statement_imports.id"), nullable=False, index=True)
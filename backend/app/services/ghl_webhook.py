@@ -25,6 +25,9 @@ class GHLWebhookService:
         self.winback_webhook_url = getattr(settings, 'GHL_WINBACK_WEBHOOK_URL', None)
         self.crosssell_webhook_url = getattr(settings, 'GHL_CROSSSELL_WEBHOOK_URL', None)
         self.uw_webhook_url = getattr(settings, 'GHL_UW_WEBHOOK_URL', None)
+        # Set while firing a batch: one keep-alive HTTP session, logs written once
+        self._http = None
+        self._pending_logs = None
 
     def _fire(self, url: str, payload: dict, event_type: str) -> dict:
         """Fire a webhook and log the result."""
@@ -33,7 +36,7 @@ class GHLWebhookService:
             return {"skipped": True, "reason": "no_url_configured"}
 
         try:
-            resp = requests.post(
+            resp = (self._http or requests).post(
                 url,
                 json=payload,
                 headers={
@@ -67,23 +70,35 @@ class GHLWebhookService:
             return result
 
     def _log_webhook(self, direction: str, event_type: str, payload: dict, result: dict):
-        """Log webhook to database (non-blocking)."""
+        """Log webhook to database (non-blocking). Deferred while firing a batch."""
+        entry = (direction, event_type, payload, result)
+        if self._pending_logs is not None:
+            self._pending_logs.append(entry)
+        else:
+            self._write_logs([entry])
+
+    def _write_logs(self, entries: list):
+        """Write webhook log rows in a single session/commit."""
+        if not entries:
+            return
         try:
             from app.core.database import SessionLocal
             from app.models.campaign import GHLWebhookLog
             db = SessionLocal()
             try:
-                log = GHLWebhookLog(
-                    direction=direction,
-                    event_type=event_type,
-                    customer_name=payload.get("first_name", "") + " " + payload.get("last_name", ""),
-                    customer_email=payload.get("email"),
-                    payload=payload,
-                    response_status=result.get("status_code"),
-                    response_body=result.get("response", ""),
-                    error=result.get("error"),
-                )
-                db.add(log)
+                db.add_all([
+                    GHLWebhookLog(
+                        direction=direction,
+                        event_type=event_type,
+                        customer_name=payload.get("first_name", "") + " " + payload.get("last_name", ""),
+                        customer_email=payload.get("email"),
+                        payload=payload,
+                        response_status=result.get("status_code"),
+                        response_body=result.get("response", ""),
+                        error=result.get("error"),
+                    )
+                    for direction, event_type, payload, result in entries
+                ])
                 db.commit()
             finally:
                 db.close()
@@ -186,6 +201,32 @@ class GHLWebhookService:
         }
         return self._fire(self.quote_webhook_url, payload, f"quote_not_converted_{days_since}d")
 
+    def fire_quote_followups(self, followups: list) -> list:
+        """Fire many quote follow-up webhooks (each item = fire_quote_followup kwargs).
+
+        GHL inbound webhooks take one contact per call, so this still POSTs
+        per quote — but over one keep-alive connection, with the audit log
+        written in a single commit at the end.
+        """
+        if not followups:
+            return []
+        self._pending_logs = []
+        try:
+            with requests.Session() as http:
+                self._http = http
+                results = []
+                for f in followups:
+                    try:
+                        results.append(self.fire_quote_followup(**f))
+                    except Exception as e:  # one bad payload must not stop the rest
+                        logger.error(f"GHL quote follow-up webhook failed: {e}")
+                        results.append({"success": False, "error": str(e)})
+                return results
+        finally:
+            self._http = None
+            entries, self._pending_logs = self._pending_logs, None
+            self._write_logs(entries)
+
     def fire_winback(self, customer_name: str, email: str, phone: str,
                      carrier: str, policy_type: str, months_active: int,
                      cancel_reason: str) -> dict:
@@ -3,7 +3,9 @@
 Sends professional past-due notices branded per carrier, with payment links
 and agency contact info. Mirrors the welcome email pattern.
 """
+import asyncio
 import logging
+import httpx
 import requests
 from typing import Optional
 from app.core.config import settings
@@ -150,7 +152,7 @@ def build_nonpay_email_html(
     return subject, "\n".join(h)
 
 
-def send_nonpay_email(
+def _nonpay_mail_data(
     to_email: str,
     client_name: str,
     policy_number: str,
@@ -159,14 +161,7 @@ def send_nonpay_email(
     due_date: Optional[str] = None,
     cancel_date: Optional[str] = None,
 ) -> dict:
-    """Send past-due email via Mailgun."""
-    if not settings.MAILGUN_API_KEY or not settings.MAILGUN_DOMAIN:
-        logger.warning("Mailgun not configured - skipping non-pay email")
-        return {"success": False, "error": "Mailgun not configured"}
-
-    if not to_email:
-        return {"success": False, "error": "No email address"}
-
+    """Build the Mailgun form fields for a past-due email."""
     subject, html_body = build_nonpay_email_html(
         client_name=client_name,
         policy_number=policy_number,
@@ -176,7 +171,7 @@ def send_nonpay_email(
         cancel_date=cancel_date,
     )
 
-    mail_data = {
+    return {
         # Hardcode the apex-domain From — was previously
         # f"{AGENCY_NAME} <service@{settings.MAILGUN_DOMAIN}>" which
         # depended on MAILGUN_DOMAIN happening to be set to the apex.
@@ -195,6 +190,69 @@ def send_nonpay_email(
         "bcc": ["evan@betterchoiceins.com"],
     }
 
+
+def _after_nonpay_sent(
+    to_email: str,
+    client_name: str,
+    policy_number: str,
+    carrier: str,
+    amount_due: Optional[float] = None,
+    due_date: Optional[str] = None,
+):
+    """Post-send follow-ups: NowCerts note + GHL webhook (both non-blocking on failure)."""
+    # Add note in NowCerts
+    _add_nowcerts_nonpay_note(
+        client_name=client_name,
+        to_email=to_email,
+        policy_number=policy_number,
+        carrier=carrier,
+        amount_due=amount_due,
+        due_date=due_date,
+    )
+
+    # Fire GHL webhook for AI calling
+    try:
+        from app.services.ghl_webhook import get_ghl_service
+        ghl = get_ghl_service()
+        carrier_fmt = (carrier or "").replace("_", " ").title()
+        from app.services.welcome_email import CARRIER_INFO
+        carrier_info = CARRIER_INFO.get((carrier or "").lower().replace(" ", "_"), {})
+        carrier_phone = carrier_info.get("payment_phone", carrier_info.get("customer_service", "847-908-5665"))
+        ghl.fire_nonpay_sent(
+            customer_name=client_name,
+            email=to_email,
+            phone="",  # Phone looked up by GHL from contact
+            policy_number=policy_number,
+            carrier=carrier_fmt,
+            amount_due=f"${float(amount_due):,.2f}" if amount_due else "N/A",
+            due_date=due_date or "N/A",
+            carrier_phone=carrier_phone,
+        )
+    except Exception as ghl_err:
+        logger.debug(f"GHL webhook failed (non-blocking): {ghl_err}")
+
+
+def send_nonpay_email(
+    to_email: str,
+    client_name: str,
+    policy_number: str,
+    carrier: str,
+    amount_due: Optional[float] = None,
+    due_date: Optional[str] = None,
+    cancel_date: Optional[str] = None,
+) -> dict:
+    """Send past-due email via Mailgun."""
+    if not settings.MAILGUN_API_KEY or not settings.MAILGUN_DOMAIN:
+        logger.warning("Mailgun not configured - skipping non-pay email")
+        return {"success": False, "error": "Mailgun not configured"}
+
+    if not to_email:
+        return {"success": False, "error": "No email address"}
+
+    mail_data = _nonpay_mail_data(
+        to_email, client_name, policy_number, carrier, amount_due, due_date, cancel_date,
+    )
+
     try:
         resp = requests.post(
             f"https://api.mailgun.net/v3/{settings.MAILGUN_DOMAIN}/messages",
@@ -205,38 +263,54 @@ def send_nonpay_email(
         if resp.status_code == 200:
             msg_id = resp.json().get("id", "")
             logger.info("Non-pay email sent to %s for policy %s - msg_id: %s", to_email, policy_number, msg_id)
+            _after_nonpay_sent(to_email, client_name, policy_number, carrier, amount_due, due_date)
+            return {"success": True, "message_id": msg_id}
+        else:
+            logger.error("Mailgun error %s: %s", resp.status_code, resp.text)
+            return {"success": False, "error": f"Mailgun returned {resp.status_code}"}
+    except Exception as e:
+        logger.error("Failed to send non-pay email: %s", e)
+        return {"success": False, "error": str(e)}
 
-            # Add note in NowCerts
-            _add_nowcerts_nonpay_note(
-                client_name=client_name,
-                to_email=to_email,
-                policy_number=policy_number,
-                carrier=carrier,
-                amount_due=amount_due,
-                due_date=due_date,
-            )
 
-            # Fire GHL webhook for AI calling
-            try:
-                from app.services.ghl_webhook import get_ghl_service
-                ghl = get_ghl_service()
-                carrier_fmt = (carrier or "").replace("_", " ").title()
-                from app.services.welcome_email import CARRIER_INFO
-                carrier_info = CARRIER_INFO.get((carrier or "").lower().replace(" ", "_"), {})
-                carrier_phone = carrier_info.get("payment_phone", carrier_info.get("customer_service", "847-908-5665"))
-                ghl.fire_nonpay_sent(
-                    customer_name=client_name,
-                    email=to_email,
-                    phone="",  # Phone looked up by GHL from contact
-                    policy_number=policy_number,
-                    carrier=carrier_fmt,
-                    amount_due=f"${float(amount_due):,.2f}" if amount_due else "N/A",
-                    due_date=due_date or "N/A",
-                    carrier_phone=carrier_phone,
-                )
-            except Exception as ghl_err:
-                logger.debug(f"GHL webhook failed (non-blocking): {ghl_err}")
+async def send_nonpay_email_async(
+    client: httpx.AsyncClient,
+    to_email: str,
+    client_name: str,
+    policy_number: str,
+    carrier: str,
+    amount_due: Optional[float] = None,
+    due_date: Optional[str] = None,
+    cancel_date: Optional[str] = None,
+) -> dict:
+    """Async send_nonpay_email over a shared httpx client, for bulk dispatch.
+
+    Same result shape; the NowCerts note / GHL follow-ups use blocking
+    clients, so they run in a worker thread.
+    """
+    if not settings.MAILGUN_API_KEY or not settings.MAILGUN_DOMAIN:
+        logger.warning("Mailgun not configured - skipping non-pay email")
+        return {"success": False, "error": "Mailgun not configured"}
+
+    if not to_email:
+        return {"success": False, "error": "No email address"}
+
+    mail_data = _nonpay_mail_data(
+        to_email, client_name, policy_number, carrier, amount_due, due_date, cancel_date,
+    )
 
+    try:
+        resp = await client.post(
+            f"https://api.mailgun.net/v3/{settings.MAILGUN_DOMAIN}/messages",
+            auth=("api", settings.MAILGUN_API_KEY),
+            data=mail_data,
+        )
+        if resp.status_code == 200:
+            msg_id = resp.json().get("id", "")
+            logger.info("Non-pay email sent to %s for policy %s - msg_id: %s", to_email, policy_number, msg_id)
+            await asyncio.to_thread(
+                _after_nonpay_sent, to_email, client_name, policy_number, carrier, amount_due, due_date,
+            )
             return {"success": True, "message_id": msg_id}
         else:
             logger.error("Mailgun error %s: %s", resp.status_code, resp.text)
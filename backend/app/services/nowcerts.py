@@ -6,7 +6,9 @@ and pushing new insureds/policies to NowCerts.
 API docs: https://api.nowcerts.com/Help
 """
 import logging
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from app.core.config import settings
@@ -23,6 +25,7 @@ class NowCertsClient:
         self.password = settings.NOWCERTS_PASSWORD
         self._token: Optional[str] = None
         self._token_expiry: Optional[datetime] = None
+        self._auth_lock = threading.Lock()
         self._last_auth_errors: list[str] = []
 
     @property
@@ -30,10 +33,17 @@ class NowCertsClient:
         return bool(self.username and self.password)
 
     def _authenticate(self) -> str:
-        """Get an OAuth2 token from NowCerts. Tries multiple auth methods."""
+        """Return the cached OAuth2 token, logging in when it is missing or expired."""
         if self._token and self._token_expiry and datetime.utcnow() < self._token_expiry:
             return self._token
+        # search_insureds_many calls in from several threads — log in once
+        with self._auth_lock:
+            if self._token and self._token_expiry and datetime.utcnow() < self._token_expiry:
+                return self._token
+            return self._login()
 
+    def _login(self) -> str:
+        """Get an OAuth2 token from NowCerts. Tries multiple auth methods."""
         if not self.is_configured:
             raise ValueError("NowCerts credentials not configured")
 
@@ -217,6 +227,16 @@ class NowCertsClient:
             except Exception:
                 return []
 
+    def search_insureds_many(self, queries: list[str], limit: int = 50) -> dict[str, list[dict]]:
+        """Run several search_insureds calls concurrently; returns results keyed
+        by query. Costs one round-trip of wall time instead of one per query."""
+        queries = list(dict.fromkeys(q for q in queries if q))
+        if len(queries) <= 1:
+            return {q: self.search_insureds(q, limit=limit) for q in queries}
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            results = pool.map(lambda q: self.search_insureds(q, limit=limit), queries)
+            return dict(zip(queries, results))
+
     def _search_via_zapier(self, query: str, limit: int) -> list[dict]:
         """Fallback search using Zapier/GetInsureds."""
         data = self._get("/api/Zapier/GetInsureds")
@@ -6,6 +6,12 @@ import httpx
 from typing import Optional
 from app.core.config import settings
 
+# pybase64 (SIMD) when installed; the stdlib encoder otherwise
+try:
+    import pybase64
+except ImportError:
+    pybase64 = None
+
 EXTRACTION_PROMPT = """You are an expert insurance document parser. Analyze this PDF insurance application/declaration page and extract the following data.
 
 Return ONLY a valid JSON object with these fields:
@@ -69,6 +75,13 @@ IMPORTANT RULES FOR COVERAGE LIMITS:
 - Return ONLY the JSON, no markdown, no explanation"""
 
 
+def b64encode_pdf(pdf_bytes: bytes) -> str:
+    """Base64-encode a PDF for a Claude document block."""
+    if pybase64 is not None:
+        return pybase64.b64encode_as_string(pdf_bytes)
+    return base64.b64encode(pdf_bytes).decode("ascii")
+
+
 def truncate_pdf(pdf_bytes: bytes, max_pages: int = 50) -> bytes:
     """Truncate a PDF to the first N pages to stay within API limits."""
     try:
@@ -98,7 +111,7 @@ async def extract_pdf_data(pdf_bytes: bytes) -> dict:
     # Truncate large PDFs
     pdf_bytes = truncate_pdf(pdf_bytes, max_pages=50)
 
-    pdf_base64 = base64.standard_b64encode(pdf_bytes).decode("utf-8")
+    pdf_base64 = b64encode_pdf(pdf_bytes)
 
     headers = {
         "x-api-key": settings.ANTHROPIC_API_KEY,
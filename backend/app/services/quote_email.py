@@ -9,6 +9,7 @@ Sends professional carrier-specific emails with:
 """
 import logging
 import os
+import re
 import requests
 from typing import Optional
 from datetime import datetime
@@ -223,6 +224,83 @@ CARRIER_TRUST = {
 }
 
 
+# ── HTML helpers (module level so a render doesn't rebuild them) ──
+
+def _fmt_money(v):
+    if v is None:
+        return None
+    try:
+        n = float(v)
+        return f"${n:,.0f}"
+    except (TypeError, ValueError):
+        return None
+
+
+def _build_3card_row(cards, accent_hex):
+    """cards = [(label, value), ...]  — emits a 3-up grid with consistent styling.
+
+    Skips cards with None/empty values so we never show 'N/A' boxes.
+    Pads to 3 if needed (with empty boxes) so layout stays even.
+    """
+    valid = [(lbl, val) for lbl, val in cards if val]
+    if not valid:
+        return ""
+    cells = ""
+    for lbl, val in valid:
+        cells += f"""
+            <td style="padding:6px;text-align:center;width:33%;vertical-align:top;">
+                <div style="background:{accent_hex}10;border:1px solid {accent_hex}25;border-radius:8px;padding:14px 8px;">
+                    <p style="margin:0;font-size:18px;font-weight:800;color:#1e293b;letter-spacing:-0.5px;">{val}</p>
+                    <p style="margin:4px 0 0 0;font-size:10px;color:#64748B;text-transform:uppercase;letter-spacing:0.8px;font-weight:600;">{lbl}</p>
+                </div>
+            </td>"""
+    # If only 1 or 2 valid cards, pad with empty cells for alignment
+    for _ in range(3 - len(valid)):
+        cells += '<td style="width:33%;"></td>'
+    return f"""
+    <table style="width:100%;border-collapse:collapse;margin:8px 0;" cellpadding="0" cellspacing="0">
+        <tr>{cells}</tr>
+    </table>"""
+
+
+# For auto, prepend "$" to numeric-only limits like "100"
+def _fmt_auto(v):
+    if not v:
+        return None
+    v_str = str(v).strip()
+    if not v_str or v_str.lower() == "none":
+        return None
+    # If purely numeric, treat as $Nk
+    try:
+        float(v_str)
+        return f"${v_str}k"
+    except ValueError:
+        pass
+    # If split limit (e.g. 100/300), format as $100k/$300k
+    if "/" in v_str:
+        parts = v_str.split("/")
+        if all(p.strip().replace(".", "").isdigit() for p in parts):
+            return "/".join(f"${p.strip()}k" for p in parts)
+    return v_str  # fallback: as-is
+
+
+_MONTHS_RE = re.compile(r'(\d+)')
+
+
+def _monthly_premium(premium: str, premium_term: str) -> Optional[str]:
+    """Per-month display for a "$1,234.56" premium over a multi-month term,
+    or None if it can't be worked out."""
+    try:
+        total = float(premium.replace("$", "").replace(",", ""))
+        months_match = _MONTHS_RE.search(premium_term or "")
+        months = int(months_match.group(1)) if months_match else 0
+        if months > 1:
+            return f"${total / months:,.2f}"
+    except (ValueError, ZeroDivisionError):
+        pass
+    return None
+
+
 def build_quote_email_html(
     prospect_name: str,
     carrier: str,
@@ -280,41 +358,6 @@ def build_quote_email_html(
     home_has_any = any([coverage_dwelling, coverage_personal_property, coverage_liability])
     auto_has_any = any([auto_bi_limit, auto_pd_limit, auto_um_limit])
 
-    def _fmt_money(v):
-        if v is None:
-            return None
-        try:
-            n = float(v)
-            return f"${n:,.0f}"
-        except (TypeError, ValueError):
-            return None
-
-    def _build_3card_row(cards, accent_hex):
-        """cards = [(label, value), ...]  — emits a 3-up grid with consistent styling.
-
-        Skips cards with None/empty values so we never show 'N/A' boxes.
-        Pads to 3 if needed (with empty boxes) so layout stays even.
-        """
-        valid = [(lbl, val) for lbl, val in cards if val]
-        if not valid:
-            return ""
-        cells = ""
-        for lbl, val in valid:
-            cells += f"""
-                <td style="padding:6px;text-align:center;width:33%;vertical-align:top;">
-                    <div style="background:{accent_hex}10;border:1px solid {accent_hex}25;border-radius:8px;padding:14px 8px;">
-                        <p style="margin:0;font-size:18px;font-weight:800;color:#1e293b;letter-spacing:-0.5px;">{val}</p>
-                        <p style="margin:4px 0 0 0;font-size:10px;color:#64748B;text-transform:uppercase;letter-spacing:0.8px;font-weight:600;">{lbl}</p>
-                    </div>
-                </td>"""
-        # If only 1 or 2 valid cards, pad with empty cells for alignment
-        for _ in range(3 - len(valid)):
-            cells += '<td style="width:33%;"></td>'
-        return f"""
-        <table style="width:100%;border-collapse:collapse;margin:8px 0;" cellpadding="0" cellspacing="0">
-            <tr>{cells}</tr>
-        </table>"""
-
     if home_has_any or auto_has_any:
         rows_inner = ""
         if home_has_any:
@@ -327,26 +370,6 @@ def build_quote_email_html(
                 accent,
             )
         if auto_has_any:
-            # For auto, prepend "$" to numeric-only limits like "100"
-            def _fmt_auto(v):
-                if not v:
-                    return None
-                v_str = str(v).strip()
-                if not v_str or v_str.lower() == "none":
-                    return None
-                # If purely numeric, treat as $Nk
-                try:
-                    float(v_str)
-                    return f"${v_str}k"
-                except ValueError:
-                    pass
-                # If split limit (e.g. 100/300), format as $100k/$300k
-                if "/" in v_str:
-                    parts = v_str.split("/")
-                    if all(p.strip().replace(".", "").isdigit() for p in parts):
-                        return "/".join(f"${p.strip()}k" for p in parts)
-                return v_str  # fallback: as-is
-
             rows_inner += _build_3card_row(
                 [
                     ("Bodily Injury", _fmt_auto(auto_bi_limit)),
@@ -474,20 +497,8 @@ def build_quote_email_html(
         unsub_url = f"{api_url}/api/unsubscribe/{unsubscribe_token}"
         unsub_html = f'<p style="color:#94a3b8;font-size:11px;margin:4px 0 0 0;"><a href="{unsub_url}" style="color:#94a3b8;text-decoration:underline;">Unsubscribe from follow-up emails</a></p>'
 
-    # Calculate monthly premium for any multi-month term
-    monthly_display = premium  # fallback to full premium if can't calculate
-    if premium:
-        try:
-            raw = premium.replace("$", "").replace(",", "")
-            total = float(raw)
-            import re
-            months_match = re.search(r'(\d+)', premium_term or "")
-            months = int(months_match.group(1)) if months_match else 0
-            if months > 1:
-                monthly = total / months
-                monthly_display = f"${monthly:,.2f}"
-        except (ValueError, ZeroDivisionError):
-            pass
+    # Calculate monthly premium for any multi-month term (full premium if it can't be)
+    monthly_display = (_monthly_premium(premium, premium_term) if premium else None) or premium
 
     return f"""<!DOCTYPE html>
 <html><head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1.0"></head>
@@ -642,17 +653,7 @@ def send_quote_email(
     policy_label = POLICY_TYPE_LABELS.get(policy_type, "Insurance")
 
     # Calculate monthly for subject line too
-    subject_premium = premium
-    try:
-        raw = premium.replace("$", "").replace(",", "")
-        total = float(raw)
-        import re
-        months_match = re.search(r'(\d+)', premium_term or "")
-        months = int(months_match.group(1)) if months_match else 0
-        if months > 1:
-            subject_premium = f"${total / months:,.2f}"
-    except (ValueError, ZeroDivisionError):
-        pass
+    subject_premium = _monthly_premium(premium, premium_term) or premium
     subject = f"Your {carrier_name} {policy_label} Quote \u2014 {subject_premium}/month"
     html = build_quote_email_html(
         prospect_name=prospect_name,
@@ -7,14 +7,17 @@ Workflow:
 4. Calculate agent commission based on prior month tier
 5. Present reconciliation summary for review
 """
+import copy
 import logging
+import time
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from app.models.statement import (
     StatementImport, StatementLine, StatementStatus,
@@ -27,6 +30,19 @@ from app.services.carrier_parsers import parse_statement
 
 logger = logging.getLogger(__name__)
 
+# Memoized calculate_monthly_pay results
+# (key=period, value=(source_version, expires_at_ts, result))
+_MONTHLY_PAY_CACHE: Dict[str, Tuple[tuple, float, Dict]] = {}
+_MONTHLY_PAY_CACHE_TTL_SECONDS = 3600
+
+
+def invalidate_monthly_pay_cache(period: Optional[str] = None) -> None:
+    """Drop the memoized monthly pay for one period (or all periods)."""
+    if period is None:
+        _MONTHLY_PAY_CACHE.clear()
+    else:
+        _MONTHLY_PAY_CACHE.pop(period, None)
+
 
 def _is_within_first_term(line, matched_sale, statement_period: str) -> bool:
     """Determine if a statement line should earn producer commission.
@@ -682,6 +698,64 @@ class ReconciliationService:
 
     # ── Combined Monthly Pay ─────────────────────────────────────────
 
+    def _monthly_pay_source_version(self, period: str) -> tuple:
+        """Fingerprint of every table calculate_monthly_pay reads.
+
+        Statement lines carry no updated_at, so the period's lines are hashed
+        row by row (md5 over every column the calculation reads or writes):
+        swapping agents between two lines, re-matching, or clearing the
+        persisted agent commission all change the key. Sales, users and tiers
+        are fingerprinted by count/max id/last change.
+        """
+        sep = literal_column("':'")
+        line_row = func.concat(
+            StatementLine.id, sep,
+            StatementLine.assigned_agent_id, sep,
+            StatementLine.matched_sale_id, sep,
+            StatementLine.is_matched, sep,
+            StatementLine.premium_amount, sep,
+            StatementLine.commission_amount, sep,
+            StatementLine.agent_commission_rate, sep,
+            StatementLine.agent_commission_amount,
+        )
+        lines_digest = (
+            select(func.md5(func.string_agg(line_row, aggregate_order_by(literal_column("','"), StatementLine.id))))
+            .join(StatementImport, StatementLine.statement_import_id == StatementImport.id)
+            .where(StatementImport.statement_period == period)
+            .subquery()
+        )
+
+        def last_changed(model):
+            return func.max(func.coalesce(model.updated_at, model.created_at))
+
+        stmt = select(
+            select(func.count(), func.max(StatementImport.updated_at))
+            .where(StatementImport.statement_period == period)
+            .subquery(),
+            lines_digest,
+            select(func.count(), func.max(Sale.id), last_changed(Sale)).subquery(),
+            select(func.max(User.id), last_changed(User)).subquery(),
+            select(func.max(CommissionTier.id), last_changed(CommissionTier)).subquery(),
+        )
+        return tuple(self.db.execute(stmt).one())
+
+    def calculate_monthly_pay_cached(self, period: str) -> Dict:
+        """calculate_monthly_pay, memoized until its source data changes.
+
+        For read-only views (the monthly pay preview). Anything that locks in
+        or pays out must call calculate_monthly_pay directly. Returns a
+        private copy — callers may mutate the result in place.
+        """
+        cached = _MONTHLY_PAY_CACHE.get(period)
+        if cached and cached[1] > time.time() and cached[0] == self._monthly_pay_source_version(period):
+            return copy.deepcopy(cached[2])
+
+        result = self.calculate_monthly_pay(period)
+        # Fingerprint after the run: it persists each line's agent commission
+        version = self._monthly_pay_source_version(period)
+        _MONTHLY_PAY_CACHE[period] = (version, time.time() + _MONTHLY_PAY_CACHE_TTL_SECONDS, copy.deepcopy(result))
+        return result
+
     def calculate_monthly_pay(self, period: str) -> Dict:
         """Calculate combined agent pay across ALL carriers for a month."""
         year, month = map(int, period.split("-"))
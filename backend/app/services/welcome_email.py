@@ -29,6 +29,7 @@ Brand colors verified from official brand guidelines and brandfetch.com:
 """
 import logging
 import requests
+from functools import lru_cache
 from typing import Optional
 from app.core.config import settings
 
@@ -395,6 +396,9 @@ CARRIER_ALIASES = {
 }
 
 
+# Pure lookup over the static tables above; bounded because raw carrier
+# strings come from PDF extraction and free-text fields
+@lru_cache(maxsize=256)
 def _get_carrier_key(carrier):
     if not carrier:
         return None
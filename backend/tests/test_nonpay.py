@@ -0,0 +1,18 @@
+"""Non-pay batch rate-limit bookkeeping."""
+from datetime import datetime, timedelta, timezone
+
+from app.api.nonpay import _defer_send, _recent_contact_at
+
+
+def test_recent_contact_mixes_prefetched_and_batch_sends():
+    # sent_at is timestamptz, so _prefetch_recent_contacts yields aware values
+    prefetched_at = datetime.now(timezone.utc) - timedelta(days=2)
+    recent_contacts = {("P-100", "letter_sent"): prefetched_at}
+
+    # An email to the same policy later in the batch
+    _defer_send({}, recent_contacts, "email", {"policy_number": "P-100"}, {})
+
+    last_sent = _recent_contact_at(None, "P-100", ("sent", "letter_sent"), recent_contacts)
+    assert last_sent > prefetched_at
+    assert last_sent.tzinfo is not None
+    assert last_sent.isoformat().endswith("+00:00")